@@ -0,0 +1,280 @@
+#!/usr/bin/env python
+"""Benchmarks of the output rendering.
+
+Synthetic results are formatted by `format_output` and written with
+`write_output`, the way query results are printed, for:
+
+* 1k, 100k or 1M rows,
+* narrow (3 columns) or wide (20 columns) results,
+* numeric, text or NULL-heavy values,
+* the psql table format, expanded (\\x) and unaligned (\\a) output, and
+  every other table format for narrow text results.
+
+Each case runs in a new process, which reports the rows formatted per second
+and the growth of its peak memory while formatting. The results can be saved
+as a baseline, and later runs compared against it:
+
+    $ python tests/benchmark.py --save baseline.json
+    $ python tests/benchmark.py --compare baseline.json
+
+The comparison exits with status 1 if a case got slower, or used more memory,
+by more than the tolerance.
+"""
+from __future__ import print_function
+
+import json
+import os
+import subprocess
+import sys
+
+from itertools import cycle, islice
+from optparse import OptionParser, SUPPRESS_HELP
+from time import time
+
+try:
+    from inspect import getfullargspec as getargspec
+except ImportError:  # Python 2
+    from inspect import getargspec
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                '..'))
+
+from vcli.main import format_output, write_output
+from vcli.packages.tabulate import tabulate, tabulate_formats
+
+# Type codes of the cursor description. They are Vertica's, so that the
+# script also runs against older releases, to make a baseline of them.
+INTEGER = 6
+FLOAT = 7
+VARCHAR = 9
+
+# Older releases don't take the description, and check the type of every
+# value instead
+DESCRIPTION_ARG = 'description' in getargspec(format_output).args
+
+SIZES = {'1k': 1000, '100k': 100000, '1m': 1000000}
+DEFAULT_SIZES = '1k,100k'
+
+SHAPES = {'narrow': 3, 'wide': 20}
+DATA = ('numeric', 'text', 'nulls')
+MODES = ('psql', 'x', 'a')
+
+# Distinct rows generated for a result, which are repeated up to its size
+POOL_SIZE = 1000
+
+# Each case is formatted this many times, and the fastest run is kept
+DEFAULT_REPEAT = 3
+
+# Slower or larger by more than this fraction of the baseline is a regression
+DEFAULT_TOLERANCE = 0.1
+
+# Memory growth below this is noise, in kilobytes
+MEMORY_SLACK = 1024
+
+
+class SyntheticCursor(object):
+    """A result of `rows` rows, with the `description` and `iterate()` of a
+    cursor."""
+
+    def __init__(self, rows, columns, data):
+        self.rowcount = rows
+        if data == 'numeric':
+            types = [(INTEGER, FLOAT)[i % 2]
+                     for i in range(columns)]
+        else:
+            types = [VARCHAR] * columns
+        self.description = [('col%d' % i, t) for i, t in enumerate(types)]
+        self.pool = [self._row(i, data, types) for i in range(POOL_SIZE)]
+
+    @staticmethod
+    def _row(i, data, types):
+        row = []
+        for column, type_code in enumerate(types):
+            n = i * (column + 1)
+            if data == 'nulls' and (i + column) % 5:
+                row.append(None)
+            elif type_code == INTEGER:
+                row.append(n)
+            elif type_code == FLOAT:
+                row.append(n / 7.0)
+            else:
+                row.append(u'value %d ' % n + u'x' * (n % 30))
+        return tuple(row)
+
+    def iterate(self):
+        return islice(cycle(self.pool), self.rowcount)
+
+
+class NullOutput(object):
+    """Counts the characters written to it."""
+
+    def __init__(self):
+        self.size = 0
+
+    def write(self, text):
+        self.size += len(text)
+
+
+def cases(sizes):
+    """Yield the names of the cases, 'rows/shape-data/mode'."""
+    for size in sizes:
+        for shape in sorted(SHAPES):
+            for data in DATA:
+                for mode in MODES:
+                    yield '%s/%s-%s/%s' % (size, shape, data, mode)
+        for fmt in tabulate_formats:
+            if fmt not in MODES:
+                yield '%s/narrow-text/%s' % (size, fmt)
+
+
+def peak_memory():
+    """Peak memory of this process in kilobytes, or None."""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    if sys.platform == 'darwin':  # in bytes
+        peak //= 1024
+    return peak
+
+
+def run_case(name, repeat=DEFAULT_REPEAT):
+    """Format the result of case `name` and return its measures. The memory
+    is measured on the first run, the time is that of the fastest one."""
+    size, result, mode = name.split('/')
+    shape, data = result.split('-')
+    cur = SyntheticCursor(SIZES[size], SHAPES[shape], data)
+    headers = [d[0] for d in cur.description]
+
+    table_format = 'psql' if mode in ('x', 'a') else mode
+
+    memory_before = peak_memory()
+    elapsed = None
+    for _ in range(max(repeat, 1)):
+        output = NullOutput()
+        kwargs = {'description': cur.description} if DESCRIPTION_ARG else {}
+        start = time()
+        write_output(output, format_output(
+            None, cur, headers, 'SELECT %d' % cur.rowcount, table_format,
+            expanded=mode == 'x', aligned=mode != 'a', **kwargs))
+        run_time = time() - start
+        if elapsed is None:
+            elapsed = run_time
+            memory_after = peak_memory()
+        elapsed = min(elapsed, run_time)
+
+    return {
+        'seconds': elapsed,
+        'rows_per_sec': cur.rowcount / max(elapsed, 1e-9),
+        'peak_kb': (memory_after - memory_before
+                    if memory_before is not None else None),
+        'output_chars': output.size,
+    }
+
+
+def run_in_process(name, repeat):
+    """Run case `name` in a new process, so its peak memory is its own."""
+    process = subprocess.Popen([sys.executable, os.path.abspath(__file__),
+                                '--run-case', name, '--repeat', str(repeat)],
+                               stdout=subprocess.PIPE)
+    out = process.communicate()[0]
+    if process.returncode:
+        raise RuntimeError('%s failed' % name)
+    return json.loads(out.decode('utf-8'))
+
+
+def regressions(name, result, baseline, tolerance):
+    """Returns the descriptions of the measures of `result` that are worse
+    than those of `baseline`."""
+    found = []
+    if result['rows_per_sec'] < baseline['rows_per_sec'] * (1 - tolerance):
+        found.append('%s: %d rows/s, baseline %d rows/s' % (
+            name, result['rows_per_sec'], baseline['rows_per_sec']))
+    if (result['peak_kb'] is not None and baseline['peak_kb'] is not None and
+            result['peak_kb'] > baseline['peak_kb'] * (1 + tolerance) +
+            MEMORY_SLACK):
+        found.append('%s: peak memory %d kB, baseline %d kB' % (
+            name, result['peak_kb'], baseline['peak_kb']))
+    return found
+
+
+def change(value, baseline):
+    if not baseline or value is None:
+        return ''
+    return '%+.0f%%' % ((value - baseline) * 100.0 / baseline)
+
+
+def main():
+    parser = OptionParser(usage='%prog [options]')
+    parser.add_option('-r', '--rows', default=DEFAULT_SIZES,
+                      help='result sizes, comma-separated among %s '
+                           '[default: %%default]' % ', '.join(
+                               sorted(SIZES, key=SIZES.get)))
+    parser.add_option('-m', '--match', default='',
+                      help='only run the cases whose name contains MATCH')
+    parser.add_option('-n', '--repeat', type='int', default=DEFAULT_REPEAT,
+                      help='runs of each case, the fastest is kept '
+                           '[default: %default]')
+    parser.add_option('-s', '--save', metavar='FILE',
+                      help='save the results as a baseline')
+    parser.add_option('-c', '--compare', metavar='FILE',
+                      help='compare the results with a saved baseline')
+    parser.add_option('-t', '--tolerance', type='float',
+                      default=DEFAULT_TOLERANCE,
+                      help='allowed slowdown or memory growth, as a fraction '
+                           'of the baseline [default: %default]')
+    parser.add_option('--run-case', help=SUPPRESS_HELP)
+    options, args = parser.parse_args()
+
+    if options.run_case:
+        print(json.dumps(run_case(options.run_case, options.repeat)))
+        return 0
+
+    sizes = [s.strip().lower() for s in options.rows.split(',')]
+    unknown = [s for s in sizes if s not in SIZES]
+    if unknown:
+        parser.error('unknown size: %s' % ', '.join(unknown))
+
+    baseline = {}
+    if options.compare:
+        with open(options.compare) as f:
+            baseline = json.load(f)
+
+    results = {}
+    table = []
+    for name in cases(sizes):
+        if options.match not in name:
+            continue
+        result = results[name] = run_in_process(name, options.repeat)
+        base = baseline.get(name, {})
+        table.append([name, int(result['rows_per_sec']),
+                      change(result['rows_per_sec'], base.get('rows_per_sec')),
+                      result['peak_kb'],
+                      change(result['peak_kb'], base.get('peak_kb'))])
+        print('%s: %d rows/s' % (name, result['rows_per_sec']),
+              file=sys.stderr)
+
+    print(tabulate(table, ['case', 'rows/s', 'change', 'peak kB', 'change'],
+                   tablefmt='psql'))
+
+    if options.save:
+        with open(options.save, 'w') as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+
+    found = []
+    for name in sorted(results):
+        if name in baseline:
+            found.extend(regressions(name, results[name], baseline[name],
+                                     options.tolerance))
+    if found:
+        print('\nRegressions:\n' + '\n'.join(found))
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
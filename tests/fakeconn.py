@@ -0,0 +1,149 @@
+"""A fake of the vertica_python connection, for the tests that don't need a
+database.
+
+Like vertica_python, a connection has a single cursor, which is returned by
+every call to `cursor()`, and which can't be used once it is closed.
+
+A cursor reads the result of a statement as a series of messages, its rows
+then maybe an error. As in vertica_python 0.5.5, an error is raised by
+whichever call reads it, fetching a row or flushing the rest of the result,
+as a `ConnectionError`. The fake sockets that cancel requests are sent on
+make the statement of the connection end with such an error.
+"""
+import struct
+
+from mock import Mock
+from vertica_python import errors
+
+from vcli.vexecute import VExecute
+
+
+class FakeCursor(object):
+
+    def __init__(self, results):
+        # {sql: (description, rows)}, statements not found have no rows
+        self.results = results
+        self.executed = []
+        self.closed = False
+        self.flushed = 0
+        # The data sent by each COPY
+        self.copied = []
+        self.description = None
+        # The rows and errors that are left to read
+        self.messages = []
+
+    def execute(self, sql):
+        if self.closed:
+            raise Exception('Cursor is closed')
+        # The rest of the previous result is read first
+        self._read_to_end()
+        self.executed.append(sql)
+        self.description, rows = self.results.get(sql, (None, ()))
+        self.messages = list(rows)
+
+    def copy(self, sql, data):
+        self.execute(sql)
+        self.copied.append(data.read())
+
+    def interrupt(self):
+        """What the server does on a cancel request: the rows it hasn't sent
+        yet are replaced by an error."""
+        if self.messages:
+            self.messages = [errors.ConnectionError(
+                'Severity: ERROR, Message: Execution canceled by operator')]
+
+    @property
+    def rowcount(self):
+        return -1
+
+    def iterate(self):
+        return iter(self.fetchone, None)
+
+    def fetchone(self):
+        if not self.messages:
+            return None
+        message = self.messages.pop(0)
+        if isinstance(message, Exception):
+            raise message
+        return message
+
+    def fetchall(self):
+        return list(self.iterate())
+
+    def flush_to_query_ready(self):
+        self.flushed += 1
+        self._read_to_end()
+
+    def _read_to_end(self):
+        while self.messages:
+            message = self.messages.pop(0)
+            if isinstance(message, Exception):
+                raise message
+
+    def close(self):
+        self.closed = True
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class FakeConnection(object):
+
+    def __init__(self, results=None, backend_pid=None, backend_key=None):
+        self.cursor_ = FakeCursor(results or {})
+        self.backend_pid = backend_pid
+        self.backend_key = backend_key
+        self.closed = False
+
+    def cursor(self):
+        return self.cursor_
+
+    def _socket(self):
+        return Mock()
+
+    def close(self):
+        self.closed = True
+
+
+class FakeSocket(object):
+
+    def __init__(self, address, sent, connections):
+        self.address = address
+        self.sent = sent
+        self.connections = connections
+        self.closed = False
+
+    def sendall(self, data):
+        self.sent.append((self.address, data))
+        length, code, pid, key = struct.unpack('!4I', data)
+        for conn in self.connections:
+            if (conn.backend_pid, conn.backend_key) == (pid, key):
+                conn.cursor_.interrupt()
+
+    def close(self):
+        self.closed = True
+
+
+def fake_sockets(monkeypatch, connections=()):
+    """Returns the list of the (address, bytes) sent on new sockets. The
+    statements of `connections` are interrupted by the cancel requests for
+    them."""
+    sent = []
+    monkeypatch.setattr(
+        'vcli.vexecute.socket.create_connection',
+        lambda address, timeout: FakeSocket(address, sent, connections))
+    return sent
+
+
+def fake_vexecute(monkeypatch, results=None, connections=None):
+    """Returns a VExecute whose connections are FakeConnections, taken from
+    `connections` if it is given."""
+    def open_connection(*args, **kwargs):
+        if connections:
+            return connections.pop(0)
+        return FakeConnection(results)
+    monkeypatch.setattr('vcli.vexecute.vertica.connect', open_connection)
+    return VExecute('db', 'user', 'password', 'localhost', 5433)
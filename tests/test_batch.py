@@ -0,0 +1,61 @@
+# -*- coding: utf-8 -*-
+from textwrap import dedent
+
+try:
+    from StringIO import StringIO
+except ImportError:
+    from io import StringIO
+
+import pytest
+
+from utils import dbtest
+from vcli.batch import row_writer, run_batch, unaligned_chunks
+
+
+@pytest.mark.parametrize('output_format, expected', [
+    ('unaligned', 'Alice|20|\n'),
+    ('csv', 'Alice,20,\n'),
+    ('tsv', 'Alice\t20\t\n'),
+])
+def test_row_writer(output_format, expected):
+    output = StringIO()
+    row_writer(output_format, output)(['Alice', 20, None])
+    assert output.getvalue() == expected
+
+
+def test_row_writer_quotes_csv_values():
+    output = StringIO()
+    row_writer('csv', output)(['a,b', 'say "hi"'])
+    assert output.getvalue() == '"a,b","say ""hi"""\n'
+
+
+
+def test_unaligned_chunks():
+    rows = [(i, 'x') for i in range(5)]
+    chunks = list(unaligned_chunks(iter(rows), ['n', 's'], batch_size=2))
+    assert chunks == ['n|s', '0|x\n1|x', '2|x\n3|x', '4|x']
+
+
+def test_unaligned_chunks_without_header():
+    assert list(unaligned_chunks([(None, u'été')])) == [u'|été']
+
+
+@dbtest
+def test_run_batch_csv(executor):
+    output = StringIO()
+    status = run_batch(executor, "select 'Alice' as name, 20 as age; "
+                                 "select 'Bob' as name, 30 as age",
+                       'csv', output=output)
+    assert status == 0
+    assert output.getvalue() == dedent("""\
+        name,age
+        Alice,20
+        name,age
+        Bob,30
+        """)
+
+
+@dbtest
+def test_run_batch_error_status(executor):
+    output = StringIO()
+    assert run_batch(executor, 'invalid syntax!', output=output) == 1
@@ -0,0 +1,162 @@
+import os
+import signal
+import socket
+import struct
+
+import pytest
+
+from vertica_python import errors
+
+from vcli.main import QueryCanceller, handle_query_error
+from vcli.vjobs import Job
+
+from fakeconn import FakeConnection, fake_sockets, fake_vexecute
+
+
+ADDRESS = ('localhost', 5433)
+
+
+def cancel_request(pid, key):
+    return struct.pack('!4I', 16, 80877102, pid, key)
+
+
+def test_cancel_request_is_sent_for_the_main_connection(monkeypatch):
+    sent = fake_sockets(monkeypatch)
+    executor = fake_vexecute(monkeypatch, connections=[
+        FakeConnection(backend_pid=12, backend_key=345)])
+    assert executor.cancel()
+    assert sent == [(ADDRESS, cancel_request(12, 345))]
+
+
+def test_cancel_requests_are_sent_for_the_pool_and_foreground_job(
+        monkeypatch):
+    sent = fake_sockets(monkeypatch)
+    executor = fake_vexecute(monkeypatch, connections=[
+        FakeConnection(backend_pid=1, backend_key=10)])
+    executor._pool = [FakeConnection(backend_pid=2, backend_key=20),
+                      FakeConnection(backend_pid=3, backend_key=30)]
+    job = Job(1, 'select 1')
+    job.conn = FakeConnection(backend_pid=4, backend_key=40)
+    executor.jobs.foreground = job
+
+    assert executor.cancel()
+    assert sent == [(ADDRESS, cancel_request(4, 40)),
+                    (ADDRESS, cancel_request(1, 10)),
+                    (ADDRESS, cancel_request(2, 20)),
+                    (ADDRESS, cancel_request(3, 30))]
+    assert job.cancelled
+
+
+def test_cancel_without_the_backend_key(monkeypatch):
+    sent = fake_sockets(monkeypatch)
+    executor = fake_vexecute(monkeypatch, connections=[
+        FakeConnection(backend_pid=12)])
+    assert not executor.cancel()
+    assert sent == []
+
+
+def test_cancel_when_the_server_is_unreachable(monkeypatch):
+    def refuse(address, timeout):
+        raise socket.error('Connection refused')
+    executor = fake_vexecute(monkeypatch, connections=[
+        FakeConnection(backend_pid=12, backend_key=345)])
+    monkeypatch.setattr('vcli.vexecute.socket.create_connection', refuse)
+    assert not executor.send_cancel_request(executor.conn)
+
+
+def test_first_ctrl_c_cancels_the_running_statement(monkeypatch):
+    sent = fake_sockets(monkeypatch)
+    executor = fake_vexecute(monkeypatch, connections=[
+        FakeConnection(backend_pid=12, backend_key=345)])
+    canceller = QueryCanceller(executor)
+    previous = signal.getsignal(signal.SIGINT)
+
+    with canceller:
+        os.kill(os.getpid(), signal.SIGINT)
+
+    assert canceller.requested
+    assert sent == [(ADDRESS, cancel_request(12, 345))]
+    assert signal.getsignal(signal.SIGINT) == previous
+
+
+def test_ctrl_c_interrupts_when_the_cancel_cannot_be_sent(monkeypatch):
+    sent = fake_sockets(monkeypatch)
+    executor = fake_vexecute(monkeypatch, connections=[FakeConnection()])
+    canceller = QueryCanceller(executor)
+
+    with pytest.raises(KeyboardInterrupt):
+        with canceller:
+            os.kill(os.getpid(), signal.SIGINT)
+
+    assert not canceller.requested
+    assert sent == []
+
+
+def test_second_ctrl_c_interrupts_and_reconnects(monkeypatch):
+    sent = fake_sockets(monkeypatch)
+    first = FakeConnection(backend_pid=12, backend_key=345)
+    second = FakeConnection(backend_pid=13, backend_key=678)
+    executor = fake_vexecute(monkeypatch, connections=[first, second])
+    canceller = QueryCanceller(executor)
+    previous = signal.getsignal(signal.SIGINT)
+
+    # What run_cli does when the statement doesn't stop after the cancel
+    with pytest.raises(KeyboardInterrupt):
+        with canceller:
+            os.kill(os.getpid(), signal.SIGINT)
+            os.kill(os.getpid(), signal.SIGINT)
+    executor.connect()
+
+    # Only the first Ctrl-C sends a cancel request
+    assert sent == [(ADDRESS, cancel_request(12, 345))]
+    assert signal.getsignal(signal.SIGINT) == previous
+    assert first.closed
+    assert executor.conn is second
+
+    # The next statement gets cancelled on the new session
+    with canceller:
+        assert not canceller.requested
+        os.kill(os.getpid(), signal.SIGINT)
+    assert sent[1:] == [(ADDRESS, cancel_request(13, 678))]
+
+
+def test_cancel_in_the_middle_of_a_fetch_keeps_the_session(monkeypatch,
+                                                           capsys):
+    conn = FakeConnection({
+        'select a from big': ([('a',)], [(i,) for i in range(1000)]),
+        'select 1': ([('?column?',)], [(1,)]),
+    }, backend_pid=12, backend_key=345)
+    fake_sockets(monkeypatch, [conn])
+    executor = fake_vexecute(monkeypatch, connections=[conn])
+    prompts = []
+    monkeypatch.setattr('vcli.main.click.prompt',
+                        lambda *args, **kwargs: prompts.append(args))
+    canceller = QueryCanceller(executor)
+
+    rows = []
+    with pytest.raises(errors.ConnectionError) as excinfo:
+        with canceller:
+            cur = executor.conn.cursor()
+            cur.execute('select a from big')
+            for row in cur.iterate():
+                rows.append(row)
+                if len(rows) == 2:
+                    os.kill(os.getpid(), signal.SIGINT)
+    handle_query_error(executor, excinfo.value, canceller.requested)
+
+    assert rows == [(0,), (1,)]
+    assert prompts == []
+    assert 'cancelled query' in capsys.readouterr()[1]
+    assert executor.conn is conn and not conn.closed
+    cur.execute('select 1')
+    assert cur.fetchall() == [(1,)]
+
+
+def test_lost_connection_offers_to_reconnect(monkeypatch):
+    first, second = FakeConnection(), FakeConnection()
+    executor = fake_vexecute(monkeypatch, connections=[first, second])
+    monkeypatch.setattr('vcli.main.click.prompt',
+                        lambda *args, **kwargs: True)
+    handle_query_error(executor, errors.ConnectionError('Connection reset'))
+    assert first.closed
+    assert executor.conn is second
@@ -0,0 +1,57 @@
+# -*- coding: utf-8 -*-
+from datetime import date
+from decimal import Decimal
+
+import pytest
+from vcli.packages.columnar import (ColumnarRows, BOOLEAN, INTEGER, FLOAT,
+                                    VARCHAR)
+
+DESCRIPTION = [('i', INTEGER), ('f', FLOAT), ('b', BOOLEAN), ('s', VARCHAR),
+               ('d', 10)]
+
+
+def test_rows_round_trip():
+    rows = [(1, 1.5, True, u'été', date(2016, 1, 31)),
+            (None, None, None, None, None),
+            (-2, 0.0, False, u'', date(2016, 2, 1))]
+    buf = ColumnarRows(DESCRIPTION, rows)
+    assert len(buf) == 3
+    assert list(buf) == rows
+    # It can be read any number of times
+    assert list(buf) == rows
+
+
+@pytest.mark.parametrize('value', [2 ** 70, Decimal('1.5'), 'text'])
+def test_values_that_dont_fit_the_column_type(value):
+    buf = ColumnarRows([('i', INTEGER)], [(1,), (value,), (None,)])
+    assert list(buf) == [(1,), (value,), (None,)]
+
+
+def test_mixed_text_and_bytes():
+    rows = [(u'a',), (b'b',)]
+    assert list(ColumnarRows([('s', VARCHAR)], rows)) == rows
+
+
+def test_description_without_type_codes():
+    rows = [(1, 'a'), (2, 'b')]
+    assert list(ColumnarRows([('a',), ('b',)], rows)) == rows
+
+
+def test_numbers_take_less_memory_than_objects():
+    rows = [(i, i / 2.0) for i in range(1000)]
+    typed = ColumnarRows([('i', INTEGER), ('f', FLOAT)], rows)
+    untyped = ColumnarRows([('i', None), ('f', None)], rows)
+    assert typed.nbytes() * 2 < untyped.nbytes()
+
+
+def test_size_is_counted_as_rows_are_appended():
+    buf = ColumnarRows([('i', INTEGER), ('d', 10)])
+    sizes = []
+    for row in [(1, date(2016, 1, 31)), (2 ** 70, Decimal('1.5')),
+                (3, u'text')]:
+        buf.append(row)
+        sizes.append(buf.nbytes())
+    assert sizes[0] < sizes[1] < sizes[2]
+    # The integer column turned into a list of objects on the second row
+    objects = ColumnarRows([('i', None)], [(1,), (2 ** 70,), (3,)])
+    assert buf.columns[0].nbytes() == objects.nbytes()
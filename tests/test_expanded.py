@@ -1,4 +1,4 @@
-from vcli.packages.expanded import expanded_table
+from vcli.packages.expanded import expanded_chunks, expanded_table
 import pytest
 
 def test_expanded_table_renders():
@@ -12,3 +12,19 @@ name | world
 age  | 456
 """
     assert expected == expanded_table(input, ["name", "age"])
+
+
+def test_expanded_chunks_are_streamed():
+    consumed = []
+
+    def rows():
+        for i in range(5):
+            consumed.append(i)
+            yield (i,)
+
+    chunks = expanded_chunks(rows(), ["n"], batch_size=2)
+    first = next(chunks)
+    assert first == ("-[ RECORD 0 ]-------------------------\nn | 0\n"
+                     "-[ RECORD 1 ]-------------------------\nn | 1")
+    assert consumed == [0, 1]
+    assert len(list(chunks)) == 2
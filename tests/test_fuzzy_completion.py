@@ -52,3 +52,17 @@ def test_ranking_based_on_shortest_match(completer):
     result = [match.text for match in completer.find_matches(text, collection)]
 
     assert result == ['user_group', 'api_user']
+
+
+def test_matches_follow_the_text_as_it_grows(completer):
+    collection = ['customer_order', 'cust_id', 'order_date', '"CustOrd"']
+    results = [[match.text for match in completer.find_matches(text,
+                                                               collection)]
+               for text in ('c', 'cu', 'cust_', 'cust_ord')]
+
+    assert results[-1] == ['customer_order']
+    assert results[1] == ['"CustOrd"', 'cust_id', 'customer_order']
+    # With a different collection for the next text
+    result = [match.text for match in
+              completer.find_matches('custord', collection[1:])]
+    assert result == ['"CustOrd"']
@@ -0,0 +1,100 @@
+import io
+
+from vcli.packages.vspecial.iocommands import run_script
+from vcli.packages.vspecial.main import VSpecial
+
+from fakeconn import FakeConnection, fake_vexecute
+
+
+def run(executor, script):
+    return list(run_script(executor, io.StringIO(script), 't.sql'))
+
+
+def test_script_shows_only_the_results_of_queries(monkeypatch):
+    conn = FakeConnection({
+        'insert into t values (1)': ([('OUTPUT',)], [(1,)]),
+        'update t set a = 2': ([('OUTPUT',)], [(3,)]),
+        'select a from t': ([('a',)], [(2,)]),
+        'delete from t': ([('OUTPUT',)], [(3,)]),
+    })
+    executor = fake_vexecute(monkeypatch, connections=[conn])
+    script = io.StringIO(u'create table t (a int);\n'
+                         u'insert into t values (1);\n'
+                         u'update t set a = 2;\n'
+                         u'select a from t;\n'
+                         u'delete from t;\n')
+
+    results = []
+    for title, rows, headers, status, _ in run_script(executor, script,
+                                                      't.sql'):
+        results.append((title, headers, rows and rows.fetchall(), status))
+
+    assert results[0] == ('> select a from t', ['a'], [(2,)], None)
+    assert len(results) == 2
+    status = results[1][3]
+    assert status.startswith('Ran 5 statements from t.sql in ')
+    assert status.endswith(', 7 rows changed.')
+    assert conn.cursor_.flushed == 3
+
+
+def test_script_without_dml_has_no_count(monkeypatch):
+    executor = fake_vexecute(monkeypatch, {'select 1': ([('?column?',)],
+                                                        [(1,)])})
+    results = run(executor, u'select 1;\n')
+    assert len(results) == 2
+    assert results[1][3].endswith('s.')
+
+
+def test_script_copies_from_local_files(monkeypatch, tmpdir):
+    path = tmpdir.join('a.csv')
+    path.write('1\n')
+    conn = FakeConnection()
+    executor = fake_vexecute(monkeypatch, connections=[conn])
+
+    run(executor, u"copy t from local '%s';\n" % path)
+
+    assert conn.cursor_.executed == ['copy t from stdin']
+    assert conn.cursor_.copied == [b'1\n']
+
+
+def test_script_sets_are_replayed_on_new_sessions(monkeypatch):
+    main, pool = FakeConnection(), FakeConnection()
+    executor = fake_vexecute(monkeypatch, connections=[main, pool])
+
+    run(executor, u"set search_path to s;\n")
+    executor.open_session()
+
+    assert pool.cursor_.executed == ['set search_path to s']
+
+
+def test_script_dml_invalidates_the_cache(monkeypatch):
+    conn = FakeConnection({'select a from t': ([('a',)], [(1,)])})
+    executor = fake_vexecute(monkeypatch, connections=[conn])
+    conn.cursor_.results[executor.search_path_query] = (
+        [('current_schemas',)], [(b'public',)])
+    executor.cache.ttl = 60
+
+    def query():
+        [(_, cur, _, _, _)] = executor.run('select a from t')
+        return cur.fetchall()
+
+    query()
+    query()
+    run(executor, u'insert into t values (2);\n')
+    conn.cursor_.results['select a from t'] = ([('a',)], [(1,), (2,)])
+
+    assert query() == [(1,), (2,)]
+    assert conn.cursor_.executed.count('select a from t') == 2
+
+
+def test_script_runs_on_the_main_session(monkeypatch, tmpdir):
+    path = tmpdir.join('t.sql')
+    path.write('select 1;\n')
+    conn = FakeConnection({'select 1': ([('?column?',)], [(1,)])})
+    executor = fake_vexecute(monkeypatch, connections=[conn])
+
+    results = list(executor.run('\\i %s' % path, VSpecial()))
+
+    assert results[0][0] == '> select 1'
+    assert results[0][1].fetchall() == [(1,)]
+    assert conn.cursor_.executed == ['select 1']
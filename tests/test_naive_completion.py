@@ -46,3 +46,31 @@ def test_column_name_completion(completer, complete_event):
         Document(text=text, cursor_position=position),
         complete_event))
     assert result == set(map(Completion, completer.all_completions))
+
+def test_completion_of_names_added_after_a_lookup(completer, complete_event):
+    completer.get_completions(Document(text='s', cursor_position=1),
+                              complete_event)
+    completer.extend_schemata(['public'])
+    completer.extend_relations([('public', 'sales_2016'), ('public', 'sales'),
+                                ('public', 'orders')], kind='tables')
+    text = 'SELECT * FROM SAL'
+    result = completer.get_completions(
+        Document(text=text, cursor_position=len(text)), complete_event)
+    assert result == [Completion(text='sales', start_position=-3),
+                      Completion(text='sales_2016', start_position=-3)]
+
+def test_completions_are_cached_until_the_metadata_changes(completer,
+                                                           complete_event):
+    from mock import patch
+    document = Document(text='SELECT * FROM sal', cursor_position=17)
+    with patch.object(completer, 'find_matches',
+                      wraps=completer.find_matches) as find_matches:
+        first = completer.get_completions(document, complete_event)
+        assert completer.get_completions(document, complete_event) == first
+        assert find_matches.call_count == 1
+
+        completer.extend_schemata(['public'])
+        completer.extend_relations([('public', 'sales')], kind='tables')
+        result = completer.get_completions(document, complete_event)
+        assert find_matches.call_count == 2
+    assert result == [Completion(text='sales', start_position=-3)]
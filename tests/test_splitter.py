@@ -0,0 +1,120 @@
+import io
+
+import pytest
+from vcli.packages.splitter import (split_statements, split_file, classify,
+                                    parse_copy_from_local, normalize,
+                                    target_table, QUERY, DML, COPY, DDL,
+                                    SESSION, SPECIAL, OTHER)
+
+
+def sqls(text):
+    return [s.sql for s in split_statements(text)]
+
+
+def test_empty_string():
+    assert sqls('') == []
+    assert sqls(' ;; ; ') == []
+
+
+def test_split_on_semicolons():
+    assert sqls('select 1; select 2;\nselect 3') == [
+        'select 1', 'select 2', 'select 3']
+
+
+@pytest.mark.parametrize('sql', [
+    "select 'a;b'",
+    "select 'it''s;'",
+    "select E'it\\'s;'",
+    'select "a;b" from t',
+    'select /* a;b */ 1',
+    'select $$a;b$$',
+    'select $body$ $$;x $body$',
+])
+def test_semicolons_in_quotes_and_comments(sql):
+    assert sqls(sql + '; select 2') == [sql, 'select 2']
+
+
+def test_semicolon_in_line_comment():
+    assert sqls('select 1 -- a;b\n; select 2') == ['select 1 -- a;b',
+                                                     'select 2']
+
+
+def test_dollar_in_identifiers():
+    assert sqls('select a$b$c from t; select 2') == [
+        'select a$b$c from t', 'select 2']
+
+
+def test_create_function_body():
+    function = ('CREATE FUNCTION f(x INT) RETURN INT AS BEGIN '
+                'RETURN (CASE WHEN x IS NULL THEN 0 ELSE x END); END')
+    assert sqls(function + '; select f(1)') == [function, 'select f(1)']
+
+
+def test_comment_only_statements_are_skipped():
+    assert sqls('select 1; -- done') == ['select 1']
+
+
+@pytest.mark.parametrize('sql, keyword, kind, mutating', [
+    ('select 1', 'select', QUERY, False),
+    ('(select 1) union (select 2)', 'select', QUERY, False),
+    ('-- comment\nWITH a AS (select 1) select * from a', 'with', QUERY, False),
+    ('insert into t values (1)', 'insert', DML, True),
+    ('copy t from stdin', 'copy', COPY, True),
+    ('drop table t', 'drop', DDL, True),
+    ('set timezone to utc', 'set', SESSION, False),
+    ('\\dt foo', '\\dt', SPECIAL, False),
+    ('explain select 1', 'explain', OTHER, False),
+])
+def test_classify(sql, keyword, kind, mutating):
+    statement = classify(sql)
+    assert statement.keyword == keyword
+    assert statement.kind == kind
+    assert statement.mutating == mutating
+
+
+def test_classify_search_path():
+    assert classify('SET search_path TO a, b').search_path
+    assert not classify("set timezone = 'search_path'").search_path
+
+
+def test_classify_copy_local():
+    assert classify("copy t from local '/tmp/a.csv' delimiter ','").copy_local
+    assert not classify("copy t from '/data/local.csv'").copy_local
+    assert not classify('copy t from local stdin').copy_local
+
+
+def test_parse_copy_from_local_multiple_files():
+    assert parse_copy_from_local(
+        "/* load */ copy t from local '~/a.csv' , 'b.csv' delimiter ','") == (
+            '/* load */ copy t from ', ['~/a.csv', 'b.csv'], " delimiter ','")
+
+
+def test_line_numbers():
+    statements = split_statements("select 1;\n\n-- two\nselect\n2; select 3")
+    assert [s.line for s in statements] == [1, 3, 5]
+
+
+@pytest.mark.parametrize('chunk_size', [1, 10, 1000])
+def test_split_file(chunk_size):
+    text = (u"select 'a;\nb';\n/* c;\n */ select 2;\n"
+            u"select $$;\n$$; select 4")
+    f = io.StringIO(text)
+    assert list(split_file(f, chunk_size)) == list(split_statements(text))
+
+
+def test_normalize():
+    assert normalize("SELECT a -- x\n  FROM t WHERE b = 'X  Y'") == (
+        "select a from t where b = 'X  Y'")
+
+
+@pytest.mark.parametrize('sql, table', [
+    ('insert into t values (1)', 't'),
+    ('UPDATE s.T SET a = 1', 't'),
+    ('delete from "S"."My Table" where a', 'My Table'),
+    ('merge into t using u on t.a = u.a', 't'),
+    ('copy t(a, b) from stdin', 't'),
+    ('truncate table t', 't'),
+    ('select * from t', None),
+])
+def test_target_table(sql, table):
+    assert target_table(sql) == table
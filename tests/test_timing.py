@@ -0,0 +1,43 @@
+from vcli.packages.timing import StageTimer, TimingHistogram
+from vcli.packages.vspecial.main import VSpecial
+
+
+def test_stage_breakdown_removes_overlap():
+    timer = StageTimer()
+    timer.seconds.update({'execute': 1.0, 'first row': 0.5, 'fetch': 2.0,
+                          'format': 3.0, 'output': 4.0})
+    assert dict(timer.breakdown()) == {'execute': 1.0, 'first row': 0.5,
+                                       'fetch': 2.0, 'format': 0.5,
+                                       'output': 1.0}
+
+
+def test_rows_are_timed_by_stage():
+    timer = StageTimer()
+    assert list(timer.rows([(1,), (2,), (3,)])) == [(1,), (2,), (3,)]
+    assert list(timer.rows([])) == []
+
+
+def test_histogram_keeps_the_last_queries():
+    histogram = TimingHistogram(size=2)
+    for seconds in (100, 0.002, 0.003):
+        histogram.add(seconds)
+    assert [row[:2] for row in histogram.rows() if row[1]] == [
+        ('1ms - 10ms', 2)]
+    assert histogram.summary().startswith('Queries: 2,')
+
+
+def test_timing_verbose():
+    vspecial = VSpecial()
+    vspecial.execute(None, '\\timing verbose')
+    assert vspecial.timing_enabled and vspecial.timing_verbose
+    vspecial.execute(None, '\\timing')
+    assert not vspecial.timing_enabled
+
+
+def test_timing_stats():
+    vspecial = VSpecial()
+    vspecial.timing_histogram.add(0.7)
+    [(title, rows, headers, status, _)] = vspecial.execute(None,
+                                                           '\\timing stats')
+    assert ('500ms - 1s', 1, '#' * 40) in rows
+    assert status.startswith('Queries: 1,')
@@ -0,0 +1,169 @@
+import pytest
+from mock import Mock
+from vcli.packages.splitter import classify
+from vcli.packages.columnar import ColumnarRows
+from vcli.vcache import CachingCursor, ResultCache
+from vcli.vexecute import VExecute
+
+from fakeconn import fake_vexecute
+
+
+DESCRIPTION = [('a',)]
+
+
+def make_cursor(rows):
+    cur = Mock()
+    cur.description = DESCRIPTION
+    cur.iterate.side_effect = lambda: iter(rows)
+    cur.fetchall.side_effect = lambda: list(rows)
+    return cur
+
+
+def caching_cursor(cur, cache, search_path=('public',)):
+    return CachingCursor(cur, cache, lambda: ('db', search_path))
+
+
+def test_repeated_query_is_served_from_cache():
+    cache = ResultCache(ttl=60)
+    cur = make_cursor([(1,), (2,)])
+
+    first = caching_cursor(cur, cache)
+    first.execute('select a from t')
+    assert list(first.iterate()) == [(1,), (2,)]
+
+    second = caching_cursor(cur, cache)
+    second.execute('SELECT  a\nFROM t -- again')
+    assert second.description == DESCRIPTION
+    assert second.rowcount == 2
+    assert list(second.iterate()) == [(1,), (2,)]
+    assert cur.execute.call_count == 1
+    assert (cache.hits, cache.misses) == (1, 1)
+
+
+def test_key_includes_search_path():
+    cache = ResultCache(ttl=60)
+    cur = make_cursor([(1,)])
+    for search_path in (('public',), ('public',), ('other',)):
+        cache_cur = caching_cursor(cur, cache, search_path)
+        cache_cur.execute('select a from t')
+        assert cache_cur.fetchall() == [(1,)]
+    assert cur.execute.call_count == 2
+
+
+def test_partly_read_result_is_not_stored():
+    cache = ResultCache(ttl=60)
+    cur = make_cursor([(1,), (2,)])
+    first = caching_cursor(cur, cache)
+    first.execute('select a from t')
+    next(first.iterate())
+    assert not cache.entries
+
+
+def test_expired_results_are_dropped(monkeypatch):
+    cache = ResultCache(ttl=10)
+    cache.put(('select 1', 'db', ()), DESCRIPTION, [(1,)])
+    now = cache.entries[('select 1', 'db', ())].created
+    monkeypatch.setattr('vcli.vcache.time', lambda: now + 11)
+    assert cache.get(('select 1', 'db', ())) is None
+    assert cache.size == 0
+
+
+def test_least_recently_used_results_are_evicted():
+    row = ('x' * 100,)
+    size = ColumnarRows(DESCRIPTION, [row]).nbytes()
+    cache = ResultCache(ttl=60, max_bytes=size * 2)
+    cache.put(('select 1',), DESCRIPTION, [row])
+    cache.put(('select 2',), DESCRIPTION, [row])
+    cache.get(('select 1',))
+    cache.put(('select 3',), DESCRIPTION, [row])
+    assert list(cache.entries) == [('select 1',), ('select 3',)]
+
+
+def test_dml_invalidates_queries_on_the_same_table():
+    cache = ResultCache(ttl=60)
+    cache.put(('select a from s.sales',), DESCRIPTION, [(1,)])
+    cache.put(('select a from t where b in (select b from sales)',),
+              DESCRIPTION, [(1,)])
+    cache.put(('select a from other',), DESCRIPTION, [(1,)])
+
+    cur = caching_cursor(make_cursor([]), cache)
+    cur.execute('insert into S.Sales values (1)')
+    assert list(cache.entries) == [('select a from other',)]
+
+
+def test_ddl_invalidates_everything():
+    cache = ResultCache(ttl=60)
+    cache.put(('select a from other',), DESCRIPTION, [(1,)])
+    cache.invalidate(classify('alter table t add column c int'))
+    assert not cache.entries
+    assert cache.size == 0
+
+
+def test_rollback_drops_the_results_with_the_changes_it_undid():
+    cache = ResultCache(ttl=60)
+    cur = make_cursor([(1,)])
+    for sql in ('insert into t values (1)', 'select a from t', 'rollback'):
+        cache_cur = caching_cursor(cur, cache)
+        cache_cur.execute(sql)
+        cache_cur.fetchall()
+        if sql.startswith('select'):
+            assert cache.entries
+    assert not cache.entries
+
+    cur = make_cursor([])
+    cache_cur = caching_cursor(cur, cache)
+    cache_cur.execute('select a from t')
+    assert cache_cur.fetchall() == []
+
+
+@pytest.mark.parametrize('sql', [
+    "select analyze_statistics('t')",
+    "SELECT PURGE_TABLE('s.t')",
+    "select close_session('node-1:0x1')",
+    "select nextval('seq')",
+    "select 1 from t where x = Random()",
+    "select a into table t2 from t",
+])
+def test_volatile_queries_are_not_cached(sql):
+    cache = ResultCache(ttl=60)
+    cur = make_cursor([(0,)])
+    for _ in range(2):
+        cache_cur = caching_cursor(cur, cache)
+        cache_cur.execute(sql)
+        assert cache_cur.fetchall() == [(0,)]
+    assert cur.execute.call_count == 2
+    assert not cache.entries
+
+
+def test_queries_of_columns_named_like_functions_are_cached():
+    cache = ResultCache(ttl=60)
+    cur = make_cursor([(0,)])
+    for _ in range(2):
+        cache_cur = caching_cursor(cur, cache)
+        cache_cur.execute('select set_id, purge_date from analyze_log')
+        cache_cur.fetchall()
+    assert cur.execute.call_count == 1
+
+
+def test_cached_select_after_a_search_path_change(monkeypatch):
+    search_path = VExecute.search_path_query
+    executor = fake_vexecute(monkeypatch, {
+        search_path: ((('search_path',),), [(b'public,v_catalog',)]),
+        'select a from t': (DESCRIPTION, [(1,)]),
+        'select b from t': (DESCRIPTION, [(2,)]),
+    })
+    executor.cache.ttl = 60
+
+    results = []
+    for sql in ('select a from t', 'set search_path to s, public',
+                'select a from t', 'select b from t'):
+        title, cur, headers, status, _ = executor.execute_normal_sql(sql)
+        if cur:
+            results.append(list(cur.iterate()))
+
+    assert results == [[(1,)], [(1,)], [(2,)]]
+    cursor = executor.conn.cursor()
+    assert not cursor.closed
+    assert cursor.executed == [search_path, 'select a from t',
+                               'set search_path to s, public', search_path,
+                               'select b from t']
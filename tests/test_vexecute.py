@@ -1,4 +1,5 @@
 # -*- coding: utf-8 -*-
+import gzip
 import os
 import tempfile
 
@@ -239,3 +240,123 @@ def test_special_command_hide_header(executor, vspecial):
                  join=True)
     assert output == dedent("""\
         Alice|20""")
+
+
+@dbtest
+def test_parallel_results_keep_statement_order(executor):
+    executor.set_parallel(2)
+    result = run(executor, "select 'foo'; select 'bar'; "
+                           "create table vcli_test.par(a varchar); "
+                           "insert into vcli_test.par values('baz'); "
+                           "select * from vcli_test.par")
+    assert "foo" in result[0]
+    assert "bar" in result[1]
+    # Runs on the main connection, which has the uncommitted insert
+    assert "baz" in result[2]
+
+
+@dbtest
+def test_parallel_queries_of_temp_tables(executor):
+    executor.set_parallel(2)
+    result = run(executor, "create local temp table par_tmp(a varchar) "
+                           "on commit preserve rows; "
+                           "insert into par_tmp values('baz'); commit; "
+                           "select * from par_tmp")
+    # Only the main session sees the table and its rows
+    assert "baz" in result[-1]
+
+
+@dbtest
+def test_parallel_syntaxerror(executor):
+    executor.set_parallel(2)
+    with pytest.raises(errors.ProgrammingError) as excinfo:
+        run(executor, "select 'foo'; select invalid syntax")
+    assert 'syntax error at or near "syntax"' in str(excinfo.value).lower()
+
+
+@dbtest
+def test_copy_from_local_multiple_files(executor):
+    run(executor, """
+        create table vcli_test.people (
+            name varchar(50),
+            age integer)
+    """)
+
+    tmpdir = tempfile.mkdtemp()
+    for name, content in [('a.csv', 'Alice,20\n'), ('b.csv', 'Bob,30\n'),
+                          ('c.csv', 'Cindy,40\nbad,row\n')]:
+        with open(os.path.join(tmpdir, name), 'w') as f:
+            f.write(content)
+
+    try:
+        output = run(executor, """
+            copy vcli_test.people from local '%s', '%s' delimiter ','
+        """ % (os.path.join(tmpdir, 'a.csv'), os.path.join(tmpdir, '[bc].csv')),
+            join=True)
+    finally:
+        for name in os.listdir(tmpdir):
+            os.remove(os.path.join(tmpdir, name))
+        os.rmdir(tmpdir)
+
+    assert 'Loaded 3 rows from 3 files' in output
+    assert '1 rows rejected' in output
+
+    output = run(executor, "select * from vcli_test.people order by 1",
+                 join=True)
+    assert output == dedent("""\
+        +--------+-------+
+        | name   |   age |
+        |--------+-------|
+        | Alice  |    20 |
+        | Bob    |    30 |
+        | Cindy  |    40 |
+        +--------+-------+""")
+
+
+@dbtest
+def test_copy_from_local_gzip(executor):
+    run(executor, """
+        create table vcli_test.people (
+            name varchar(50),
+            age integer)
+    """)
+
+    with tempfile.NamedTemporaryFile(suffix='.csv.gz', delete=False) as f:
+        with gzip.GzipFile(fileobj=f, mode='wb') as gz:
+            gz.write(b'Alice,20\nBob,30\n')
+
+    try:
+        run(executor, """
+            copy vcli_test.people from local '%s' delimiter ','
+        """ % f.name)
+    finally:
+        os.remove(f.name)
+
+    output = run(executor, "select * from vcli_test.people order by 1",
+                 join=True)
+    assert output == dedent("""\
+        +--------+-------+
+        | name   |   age |
+        |--------+-------|
+        | Alice  |    20 |
+        | Bob    |    30 |
+        +--------+-------+""")
+
+
+@dbtest
+def test_execute_from_file_continue_on_error(executor, vspecial):
+    with tempfile.NamedTemporaryFile('w', suffix='.sql', delete=False) as f:
+        f.write("create table vcli_test.t (a int);\n"
+                "insert into vcli_test.t values (1);\n"
+                "invalid syntax!;\n"
+                "select a from vcli_test.t;\n")
+
+    try:
+        output = run(executor, '\\i %s continue' % f.name, vspecial=vspecial)
+    finally:
+        os.remove(f.name)
+
+    assert '> select a from vcli_test.t' in output
+    assert not any(line.startswith('> insert') for line in output)
+    assert output[-1].startswith('Ran 4 statements from %s' % f.name)
+    assert output[-1].endswith(', 1 rows changed, 1 failed.')
@@ -0,0 +1,115 @@
+import gc
+import os
+import weakref
+
+import pytest
+from mock import Mock
+
+from vcli.vjobs import BackgroundJobs, DONE, FAILED, _remove_spill_files
+
+
+def session(rows=(), description=(('a',), ('b',)), error=None):
+    cursor = Mock()
+    cursor.description = description
+    cursor.iterate.return_value = iter(rows)
+    if error:
+        cursor.execute.side_effect = error
+    conn = Mock()
+    conn.cursor.return_value = cursor
+    return conn
+
+
+@pytest.fixture
+def vexecute():
+    return Mock()
+
+
+def test_rows_are_spilled_to_a_file(vexecute):
+    vexecute.open_session.return_value = session([(1, 'x'), (2, None)])
+    jobs = BackgroundJobs(vexecute)
+    job = jobs.start('select a, b from t')
+    jobs.attach(job)
+    path = job.spill_path
+    assert job.status == DONE
+    assert job.rowcount == 2
+    assert list(job.iterate()) == [['1', 'x'], ['2', '']]
+    assert jobs.jobs == []
+    # The result is read only once
+    assert not os.path.exists(path)
+    assert job.spill_path is None
+
+
+def test_spill_file_is_deleted_when_the_rest_is_discarded(vexecute):
+    vexecute.open_session.return_value = session([(1, 'x'), (2, None)])
+    jobs = BackgroundJobs(vexecute)
+    job = jobs.start('select a, b from t')
+    jobs.attach(job)
+    path = job.spill_path
+    rows = job.iterate()
+    assert next(rows) == ['1', 'x']
+    assert os.path.exists(path)
+    rows.close()
+    assert not os.path.exists(path)
+
+
+def test_spill_files_left_are_deleted_on_close(vexecute):
+    vexecute.open_session.return_value = session([(1, 'x')])
+    jobs = BackgroundJobs(vexecute)
+    job = jobs.start('select a, b from t')
+    job.wait()
+    path = job.spill_path
+    assert os.path.exists(path)
+    jobs.close()
+    assert not os.path.exists(path)
+    assert job.spill_path is None
+
+
+def test_spill_files_left_are_deleted_at_exit(vexecute):
+    vexecute.open_session.return_value = session([(1, 'x')])
+    jobs = BackgroundJobs(vexecute)
+    job = jobs.start('select a, b from t')
+    job.wait()
+    path = job.spill_path
+
+    # Nothing keeps the session alive until then
+    ref = weakref.ref(jobs)
+    del jobs
+    gc.collect()
+    assert ref() is None
+
+    assert os.path.exists(path)
+    _remove_spill_files()
+    assert not os.path.exists(path)
+
+
+def test_spill_file_of_a_failed_job_is_deleted(vexecute, monkeypatch,
+                                               tmpdir):
+    monkeypatch.setattr('tempfile.tempdir', str(tmpdir))
+    conn = session()
+    conn.cursor.return_value.iterate.side_effect = Exception('boom')
+    vexecute.open_session.return_value = conn
+    jobs = BackgroundJobs(vexecute)
+    job = jobs.start('select a, b from t')
+    job.wait()
+    assert job.status == FAILED
+    assert job.spill_path is None
+    assert tmpdir.listdir() == []
+
+
+def test_failed_job(vexecute):
+    vexecute.open_session.return_value = session(error=Exception('boom'))
+    jobs = BackgroundJobs(vexecute)
+    job = jobs.start('invalid syntax!')
+    job.wait()
+    assert job.status == FAILED
+    assert jobs.finished() == [job]
+    assert jobs.finished() == []
+
+
+def test_get_defaults_to_the_latest_job(vexecute):
+    vexecute.open_session.return_value = session(description=None)
+    jobs = BackgroundJobs(vexecute)
+    first, second = jobs.start('commit'), jobs.start('commit')
+    assert jobs.get() is second
+    assert jobs.get(first.id) is first
+    assert jobs.get(42) is None
@@ -0,0 +1,72 @@
+# -*- coding: utf-8 -*-
+from datetime import date
+from decimal import Decimal
+
+from vcli.vlast import LastResults
+
+
+def capture(last, rows, headers=('a', 'b')):
+    return list(last.capture('title', rows, list(headers), 'SELECT'))
+
+
+def test_rows_are_read_back_from_the_spill_file():
+    last = LastResults()
+    rows = [[1, u'été'], [Decimal('2.5'), date(2016, 1, 31)],
+            [None, '']]
+    assert capture(last, rows) == rows
+
+    result = last.get()
+    assert result.complete
+    assert result.rowcount == 3
+    assert result.headers == ['a', 'b']
+    assert list(result.iterate()) == [tuple(row) for row in rows]
+    # It can be shown any number of times
+    assert list(result.iterate()) == [tuple(row) for row in rows]
+
+
+def test_empty_result():
+    last = LastResults()
+    assert capture(last, []) == []
+    assert list(last.get().iterate()) == []
+
+
+def test_only_the_latest_results_are_kept():
+    last = LastResults(keep=2)
+    for i in range(3):
+        capture(last, [(i,)])
+    assert [list(r.iterate()) for r in last.results] == [[(2,)], [(1,)]]
+    assert last.get(1).rowcount == 1
+    assert last.get(3) is None
+
+
+def test_older_results_make_room_for_a_new_one():
+    last = LastResults(keep=5, max_bytes=1000)
+    capture(last, [('x' * 400,)])
+    capture(last, [('x' * 400,)])
+    capture(last, [('y' * 400,)])
+    assert len(last.results) == 2
+    assert all(r.complete for r in last.results)
+
+
+def test_result_too_large_is_truncated():
+    last = LastResults(keep=5, max_bytes=1000)
+    rows = [('x' * 100,)] * 20
+    assert capture(last, rows) == rows
+    result = last.get()
+    assert not result.complete
+    assert 0 < result.rowcount < 20
+
+
+def test_partly_read_result_is_incomplete():
+    last = LastResults()
+    rows = last.capture(None, [(1,), (2,)], ['a'], None)
+    next(rows)
+    assert not last.get().complete
+    assert list(last.get().iterate()) == [(1,)]
+
+
+def test_disabled():
+    last = LastResults(keep=0)
+    rows = [(1,)]
+    assert last.capture(None, rows, ['a'], None) is rows
+    assert last.get() is None
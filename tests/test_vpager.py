@@ -0,0 +1,133 @@
+import io
+import struct
+
+import click
+import pytest
+
+from vcli.vpager import BuiltinPager, PagerQuit, PipePager
+
+from fakeconn import FakeConnection, fake_sockets, fake_vexecute
+
+
+class TtyOutput(io.StringIO):
+
+    def isatty(self):
+        return True
+
+
+@pytest.fixture
+def keys(monkeypatch):
+    """The keys pressed at the prompts of a builtin pager, on a terminal of
+    four lines."""
+    pressed = []
+    monkeypatch.setattr('vcli.vpager.get_terminal_size', lambda: (80, 4))
+    monkeypatch.setattr('vcli.vpager.click.getchar',
+                        lambda: pressed.pop(0))
+    return pressed
+
+
+def lines(output):
+    """The lines written to `output`, without the prompts."""
+    prompt = click.style(BuiltinPager.prompt, reverse=True)
+    erase = u'\r%s\r' % (u' ' * len(BuiltinPager.prompt))
+    text = output.getvalue().replace(prompt + erase, u'')
+    return text.split(u'\n')
+
+
+def test_builtin_pager_writes_a_screen_at_a_time(keys):
+    output = TtyOutput()
+    pager = BuiltinPager(output)
+    keys.extend([u' ', u'\r'])
+    for i in range(7):
+        pager.write(u'%d\n' % i)
+        if i == 2:
+            # The first screen, with a line left for the prompt
+            assert keys == [u' ', u'\r']
+        elif i == 5:
+            assert keys == [u'\r']
+    pager.close()
+    assert keys == []
+    assert output.getvalue().count(BuiltinPager.prompt) == 2
+    assert lines(output) == [u'0', u'1', u'2', u'3', u'4', u'5', u'6', u'']
+
+
+def test_builtin_pager_raises_when_the_user_quits(keys):
+    output = TtyOutput()
+    pager = BuiltinPager(output)
+    keys.append(u'q')
+    with pytest.raises(PagerQuit):
+        pager.write(u'0\n1\n2\n3\n4\n')
+    assert lines(output) == [u'0', u'1', u'2', u'']
+
+    # The next result starts on a new page
+    pager.reset()
+    pager.write(u'a\nb\n')
+    assert lines(output) == [u'0', u'1', u'2', u'a', u'b', u'']
+
+
+def test_builtin_pager_counts_wrapped_lines(keys):
+    output = TtyOutput()
+    pager = BuiltinPager(output)
+    keys.append(u'q')
+    with pytest.raises(PagerQuit):
+        pager.write(u'x' * 160 + u'\n' + u'y\n' + u'z\n')
+    assert lines(output) == [u'x' * 160, u'y', u'']
+
+
+def test_builtin_pager_writes_through_when_not_a_terminal(keys):
+    output = io.StringIO()
+    pager = BuiltinPager(output)
+    pager.write(u''.join(u'%d\n' % i for i in range(10)))
+    pager.close()
+    assert output.getvalue() == u''.join(u'%d\n' % i for i in range(10))
+
+
+def test_quitting_a_result_cancels_the_rest_of_it(monkeypatch):
+    conn = FakeConnection({'select a': ([('a',)], [(1,), (2,), (3,)])},
+                          backend_pid=7, backend_key=42)
+    sent = fake_sockets(monkeypatch, [conn])
+    executor = fake_vexecute(monkeypatch, connections=[conn])
+    cur = conn.cursor()
+    cur.execute('select a')
+    cur.fetchone()
+
+    executor.close_cursor(cur)
+
+    assert sent == [(('localhost', 5433),
+                     struct.pack('!4I', 16, 80877102, 7, 42))]
+    assert cur.flushed == 2
+    # The connection's only cursor runs the next statements of a script
+    assert not cur.closed
+    cur.execute('select a')
+    assert cur.fetchall() == [(1,), (2,), (3,)]
+
+
+def test_output_that_is_not_a_terminal_is_written_directly():
+    output = io.StringIO()
+    pager = PipePager(output, command='exit 1')
+    pager.write(u'a\n')
+    pager.write(u'b\n')
+    pager.close()
+    assert pager.process is None
+    assert output.getvalue() == u'a\nb\n'
+
+
+def test_output_is_streamed_to_the_pager(tmpdir):
+    path = tmpdir.join('paged')
+    pager = PipePager(TtyOutput(), command='cat > %s' % path)
+    pager.write(u'a\n')
+    pager.write(u'b\n')
+    pager.close()
+    assert path.read() == 'a\nb\n'
+
+
+def test_write_raises_once_the_pager_has_quit():
+    pager = PipePager(TtyOutput(), command='head -c 1 > /dev/null')
+    pager.write(u'x')
+    pager.process.wait()
+    with pytest.raises(PagerQuit):
+        for _ in range(100):
+            pager.write(u'x' * 65536)
+    with pytest.raises(PagerQuit):
+        pager.write(u'x')
+    pager.close()
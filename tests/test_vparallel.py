@@ -0,0 +1,73 @@
+"""Statements spread over the connection pool, or over several connections
+for a multi-file COPY, without a database."""
+from fakeconn import FakeConnection, fake_vexecute
+
+
+def results(executor, sql):
+    return [(title, list(rows.iterate()) if rows else None)
+            for title, rows, headers, status, _ in executor.run(sql)]
+
+
+def test_queries_of_temp_tables_stay_on_the_main_connection(monkeypatch):
+    main = FakeConnection({
+        'select a from tmp': ([('a',)], [(1,)]),
+        'select b from t': ([('b',)], [(2,)]),
+    })
+    pool = FakeConnection({
+        'select a from tmp': ([('a',)], []),
+        'select b from t': ([('b',)], [(2,)]),
+    })
+    executor = fake_vexecute(monkeypatch, connections=[main, pool])
+    main.cursor_.results[executor.temp_tables_query] = (
+        [('table_name',)], [(u'Tmp',)])
+    executor.set_parallel(1)
+
+    assert results(executor, 'select a from tmp; select b from t') == [
+        (None, [(1,)]), (None, [(2,)])]
+    assert main.cursor_.executed == [executor.temp_tables_query,
+                                     'select a from tmp']
+    assert pool.cursor_.executed == ['select b from t']
+
+
+def test_temp_tables_are_looked_up_again_after_ddl(monkeypatch):
+    main = FakeConnection({'select a from tmp': ([('a',)], [(1,)])})
+    pool = FakeConnection({'select a from tmp': ([('a',)], [(2,)])})
+    executor = fake_vexecute(monkeypatch, connections=[main, pool])
+    executor.set_parallel(1)
+    catalog = main.cursor_.results
+    catalog[executor.temp_tables_query] = ([('table_name',)], [])
+
+    # A table of the same name in the search path
+    assert results(executor, 'select a from tmp') == [(None, [(2,)])]
+
+    catalog[executor.temp_tables_query] = ([('table_name',)], [(u'tmp',)])
+    list(executor.run('create local temp table tmp (a int)'))
+    assert results(executor, 'select a from tmp') == [(None, [(1,)])]
+    assert main.cursor_.executed == [
+        executor.temp_tables_query, 'create local temp table tmp (a int)',
+        executor.temp_tables_query, 'select a from tmp']
+
+
+def test_files_copied_into_a_temp_table_are_loaded_on_the_main_connection(
+        monkeypatch, tmpdir):
+    paths = []
+    for name in ('a.csv', 'b.csv'):
+        path = tmpdir.join(name)
+        path.write(name + '\n')
+        paths.append(str(path))
+    main = FakeConnection()
+    workers = [FakeConnection(), FakeConnection()]
+    executor = fake_vexecute(monkeypatch, connections=[main] + workers)
+    main.cursor_.results.update({
+        executor.temp_tables_query: ([('table_name',)], [(u'tmp',)]),
+        executor.copy_stats_query: ([('accepted',), ('rejected',)],
+                                    [(1, 0)]),
+    })
+
+    sql = "copy tmp from local '%s', '%s'" % tuple(paths)
+    [(title, rows, headers, status, _)] = executor.run(sql)
+
+    assert [row[:3] for row in rows] == [(paths[0], 1, 0), (paths[1], 1, 0)]
+    assert status.startswith('Loaded 2 rows from 2 files')
+    assert main.cursor_.copied == [b'a.csv\n', b'b.csv\n']
+    assert all(not w.cursor_.executed for w in workers)
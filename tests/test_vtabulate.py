@@ -0,0 +1,99 @@
+# -*- coding: utf-8 -*-
+from vcli.packages.tabulate import (tabulate, simple_separated_format,
+                                    _table_formats, _build_row, _compile_row,
+                                    _pad_row)
+from vcli.packages.vtabulate import column_types, stream_tabulate
+
+
+def test_small_result_is_rendered_by_tabulate():
+    rows = [("hello", 123), ("world", 4.5)]
+    chunks = list(stream_tabulate(iter(rows), ["name", "age"],
+                                  tablefmt="psql"))
+    assert chunks == [tabulate(rows, ["name", "age"], tablefmt="psql")]
+
+
+def test_streamed_rows_match_tabulate():
+    rows = [("row%d" % i, i * 1.5, None) for i in range(25)]
+    expected = tabulate(rows, ["a", "b", "c"], tablefmt="grid")
+    chunks = list(stream_tabulate(iter(rows), ["a", "b", "c"],
+                                  tablefmt="grid", sample_size=25,
+                                  batch_size=10))
+    assert len(chunks) > 1
+    assert "\n".join(chunks) == expected
+
+
+def test_rows_after_the_sample_are_formatted_lazily():
+    consumed = []
+
+    def rows():
+        for i in range(100):
+            consumed.append(i)
+            yield (i, "x")
+
+    chunks = stream_tabulate(rows(), ["n", "s"], sample_size=10,
+                             batch_size=10)
+    next(chunks)  # header
+    next(chunks)  # first batch, taken from the sample
+    assert len(consumed) == 10
+
+
+def test_values_outside_the_sample_overflow_their_cell():
+    rows = [(1,), (2,), ("a long value",)]
+    output = "\n".join(stream_tabulate(iter(rows), ["n"], tablefmt="psql",
+                                       sample_size=2))
+    assert "a long value" in output
+
+
+def test_column_types_from_the_description():
+    # Numbers stored as text stay left aligned when the column is a VARCHAR
+    rows = [(1, "10"), (20, "2")] * 10
+    description = [("n", 6, None), ("s", 9, None)]
+    streamed = "\n".join(stream_tabulate(
+        iter(rows), ["n", "s"], tablefmt="psql", sample_size=5,
+        coltypes=column_types(description)))
+    assert streamed.splitlines()[3] == "|   1 | 10  |"
+    assert streamed.splitlines()[4] == "|  20 | 2   |"
+
+
+def test_long_values_are_truncated_before_padding():
+    rows = [("x" * 10000, 1)] + [("short", 2)] * 20
+    chunks = list(stream_tabulate(iter(rows), ["s", "n"], sample_size=5,
+                                  maxcolwidth=8))
+    lines = "\n".join(chunks).splitlines()
+    assert lines[2] == u"xxxxxxx…    1"
+    assert max(len(line) for line in lines) == len(lines[2])
+
+
+def test_compiled_rows_match_build_row():
+    cells = [u"a  ", u" 1.5", u"%s"]
+    widths = [3, 4, 2]
+    aligns = ["left", "decimal", "left"]
+    formats = list(_table_formats.values())
+    formats.append(simple_separated_format(u"%d"))
+    for fmt in formats:
+        padded_widths = [w + 2 * fmt.padding for w in widths]
+        expected = _build_row(_pad_row(cells, fmt.padding), padded_widths,
+                              aligns, fmt.datarow)
+        build = _compile_row(fmt.datarow, fmt.padding, padded_widths, aligns)
+        assert build(cells) == expected
+
+
+def test_wide_characters_are_aligned():
+    rows = [(u"日本語", 1), (u"abc", 22), (u"a\tb", 3)]
+    table = tabulate(rows, ["name", "n"], tablefmt="psql")
+    assert table.split("\n")[3:6] == [
+        u"| 日本語 |   1 |",
+        u"| abc    |  22 |",
+        u"| a\tb     |   3 |",
+    ]
+
+
+def test_wide_characters_are_truncated_by_width():
+    rows = [(u"日本語のテキスト", 1), (u"東京", 2), (u"abcdefghij", 3)]
+    chunks = list(stream_tabulate(iter(rows), ["s", "n"], tablefmt="psql",
+                                  maxcolwidth=7))
+    assert "\n".join(chunks).split("\n")[3:6] == [
+        u"| 日本語… |   1 |",
+        u"| 東京    |   2 |",
+        u"| abcdef… |   3 |",
+    ]
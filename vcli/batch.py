@@ -0,0 +1,118 @@
+"""Non-interactive mode for `vcli -c SQL` and `vcli -f FILE`.
+
+Results are written straight to stdout as they are fetched, one row at a
+time, without any of the table formatting done for the interactive prompt.
+Titles and status messages are written to stderr, so stdout only contains
+the result rows.
+"""
+import csv
+import logging
+import sys
+import traceback
+
+from itertools import islice
+
+import click
+
+from .encodingutils import PY2, unicode2utf8, utf8tounicode
+from .verror import format_error
+
+_logger = logging.getLogger(__name__)
+
+BATCH_FORMATS = ('unaligned', 'csv', 'tsv')
+
+# Number of rows joined into a single chunk by `unaligned_chunks`
+UNALIGNED_BATCH_SIZE = 1000
+
+
+def run_batch(vexecute, sql, output_format='unaligned', show_header=True,
+              vspecial=None, output=None):
+    """Run the sql statements in `sql` and write their results to `output`.
+
+    :param vexecute: VExecute object
+    :param sql: A string containing one or more sql statements
+    :param output_format: One of BATCH_FORMATS
+    :param show_header: Whether to write the column names of each result
+    :param vspecial: VSpecial object, for running special commands
+    :param output: File object to write to, defaults to stdout
+    :return: The exit status, 0 on success and 1 if a statement failed
+    """
+    output = output or sys.stdout
+    write_row = row_writer(output_format, output)
+
+    try:
+        for title, cur, headers, status, _ in vexecute.run(sql, vspecial):
+            if title:
+                click.echo(title, err=True)
+            if cur and headers:
+                if show_header:
+                    write_row(headers)
+                rows = cur.iterate() if hasattr(cur, 'iterate') else cur
+                for row in rows:
+                    write_row(row)
+            if status:
+                click.echo(status, err=True)
+    except Exception as e:
+        _logger.error("sql: %r, error: %r", sql, e)
+        _logger.error("traceback: %r", traceback.format_exc())
+        click.secho(format_error(e), err=True, fg='red')
+        return 1
+    finally:
+        output.flush()
+
+    return 0
+
+
+def row_writer(output_format, output):
+    """Returns a function that writes one row to `output` in the given
+    format."""
+    if output_format == 'unaligned':
+        def write_row(row):
+            output.write(_encode('|'.join(map(_text, row)) + '\n'))
+    elif output_format in ('csv', 'tsv'):
+        delimiter = ',' if output_format == 'csv' else '\t'
+        writer = csv.writer(output, delimiter=delimiter, lineterminator='\n')
+
+        def write_row(row):
+            writer.writerow([_encode(_text(value)) for value in row])
+    else:
+        raise ValueError('unsupported output format: %r' % output_format)
+
+    return write_row
+
+
+def unaligned_chunks(rows, headers=None, batch_size=UNALIGNED_BATCH_SIZE):
+    """Yield the rows of a result with their values separated by '|', a
+    batch of lines per chunk, for the unaligned output of the prompt (`\\a`).
+
+    The values are written the same way as in batch mode, without the
+    type detection, widths and padding of an aligned table.
+
+    >>> list(unaligned_chunks(iter([(1, None), (2.5, 'x')]), ['a', 'b']))
+    ['a|b', '1|\\n2.5|x']
+    """
+    if headers:
+        yield '|'.join(map(_text, headers))
+    text = _text
+    rows = iter(rows)
+    while True:
+        batch = list(islice(rows, batch_size))
+        if not batch:
+            return
+        yield '\n'.join(['|'.join(map(text, row)) for row in batch])
+
+
+def _text(value):
+    if value is None:
+        return u''
+    if isinstance(value, bytes):
+        return utf8tounicode(value) if PY2 else value.decode('utf-8',
+                                                             'replace')
+    if PY2:
+        return unicode(value)
+    return str(value)
+
+
+def _encode(text):
+    # Python 2 file objects and the csv module expect bytes
+    return unicode2utf8(text)
@@ -0,0 +1,209 @@
+"""Compact storage for results that are fetched in full.
+
+A list of rows keeps a Python object for every value, which takes several
+times the size of the data itself. `ColumnarRows` stores each column in the
+most compact form its type allows instead, chosen from the type codes of the
+cursor description:
+
+* integers, floats and booleans in an `array`,
+* text as the utf-8 bytes of all the values of the column, one after
+  another, with an `array` of their offsets,
+* anything else (dates, numerics, ...) in a plain list.
+
+NULLs are marked in a `bytearray` next to the values. A value that doesn't
+fit the storage of its column, such as an integer that is too large, turns
+the column into a plain list, so the type codes only need to be right most
+of the time.
+"""
+from array import array
+
+from ..encodingutils import PY2
+
+if PY2:
+    from itertools import izip as zip
+    text_type = unicode
+    integer_types = (int, long)
+else:
+    text_type = str
+    integer_types = (int,)
+
+# Type codes of the Vertica data types, as found in cursor.description
+BOOLEAN = 5
+INTEGER = 6
+FLOAT = 7
+CHAR = 8
+VARCHAR = 9
+DATE = 10
+TIME = 11
+TIMESTAMP = 12
+TIMESTAMP_TZ = 13
+INTERVAL = 14
+TIME_TZ = 15
+NUMERIC = 16
+LONG_VARCHAR = 115
+
+# Array type code for 64 bit integers. 'l' is only 32 bits on Windows, where
+# Python 2 has no 'q' either and larger values end up in a plain list.
+_INT64 = 'l'
+if array('l').itemsize < 8:
+    try:
+        _INT64 = array('q').typecode
+    except ValueError:
+        pass
+
+# Rough size of a Python object and of a pointer to it, used to estimate the
+# memory of the columns stored as plain lists
+_OBJECT_SIZE = 32
+_POINTER_SIZE = 8
+
+
+class ColumnarRows(object):
+    """The rows of a result, stored column by column.
+
+    Iterating over it yields the rows as tuples.
+    """
+
+    def __init__(self, description, rows=()):
+        self.columns = [_column(d) for d in description]
+        self.length = 0
+        self.extend(rows)
+
+    def append(self, row):
+        columns = self.columns
+        for i, value in enumerate(row):
+            try:
+                columns[i].append(value)
+            except (TypeError, ValueError, OverflowError, UnicodeError):
+                columns[i] = _ObjectColumn(columns[i])
+                columns[i].append(value)
+        self.length += 1
+
+    def extend(self, rows):
+        append = self.append
+        for row in rows:
+            append(row)
+
+    def __len__(self):
+        return self.length
+
+    def __iter__(self):
+        return zip(*[column.values() for column in self.columns])
+
+    def nbytes(self):
+        """Estimated memory used by the values, in bytes."""
+        return sum(column.nbytes() for column in self.columns)
+
+
+def _column(description):
+    try:
+        type_code = description[1]
+    except (IndexError, TypeError):
+        type_code = None
+    if type_code == INTEGER:
+        return _ArrayColumn(_INT64, integer_types)
+    if type_code == FLOAT:
+        return _ArrayColumn('d', (float,))
+    if type_code == BOOLEAN:
+        return _ArrayColumn('b', (bool,))
+    if type_code in (CHAR, VARCHAR, LONG_VARCHAR):
+        return _TextColumn()
+    return _ObjectColumn()
+
+
+class _ArrayColumn(object):
+
+    def __init__(self, typecode, types):
+        self.data = array(typecode)
+        self.types = types
+        self.nulls = bytearray()
+        self.has_nulls = False
+
+    def append(self, value):
+        if value is None:
+            self.data.append(0)
+            self.nulls.append(1)
+            self.has_nulls = True
+            return
+        if not isinstance(value, self.types):
+            raise TypeError(value)
+        self.data.append(value)
+        self.nulls.append(0)
+
+    def values(self):
+        values = self.data
+        if self.types == (bool,):
+            values = (bool(v) for v in values)
+        if not self.has_nulls:
+            return iter(values)
+        return (None if null else v for v, null in zip(values, self.nulls))
+
+    def nbytes(self):
+        return len(self.data) * self.data.itemsize + len(self.nulls)
+
+
+class _TextColumn(object):
+
+    def __init__(self):
+        self.data = bytearray()
+        self.offsets = array(_INT64, [0])
+        self.nulls = bytearray()
+        # The values are either all text or all bytes, whichever comes first
+        self.type = None
+
+    def append(self, value):
+        if value is None:
+            self.offsets.append(len(self.data))
+            self.nulls.append(1)
+            return
+        if self.type is None:
+            self.type = type(value)
+        elif type(value) is not self.type:
+            raise TypeError(value)
+        if self.type is text_type:
+            self.data.extend(value.encode('utf-8'))
+        elif isinstance(value, bytes):
+            self.data.extend(value)
+        else:
+            raise TypeError(value)
+        self.offsets.append(len(self.data))
+        self.nulls.append(0)
+
+    def values(self):
+        data = self.data
+        offsets = self.offsets
+        decode = self.type is text_type
+        for i, null in enumerate(self.nulls):
+            if null:
+                yield None
+            elif decode:
+                yield data[offsets[i]:offsets[i + 1]].decode('utf-8')
+            else:
+                yield bytes(data[offsets[i]:offsets[i + 1]])
+
+    def nbytes(self):
+        return (len(self.data) + len(self.offsets) * self.offsets.itemsize +
+                len(self.nulls))
+
+
+class _ObjectColumn(object):
+
+    def __init__(self, column=None):
+        self.data = []
+        # Kept up to date, so that the size of a result being fetched can be
+        # checked as often as needed
+        self.size = 0
+        if column is not None:
+            for value in column.values():
+                self.append(value)
+
+    def append(self, value):
+        self.data.append(value)
+        self.size += _OBJECT_SIZE + _POINTER_SIZE
+        if isinstance(value, (text_type, bytes, bytearray)):
+            self.size += len(value)
+
+    def values(self):
+        return iter(self.data)
+
+    def nbytes(self):
+        return self.size
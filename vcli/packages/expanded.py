@@ -1,32 +1,40 @@
-from .tabulate import _text_type
+from itertools import islice
+
+from .textwidth import display_width
+
+# Number of records joined into a single chunk by `expanded_chunks`
+BATCH_SIZE = 100
+
 
 def pad(field, total, char=u" "):
-    return field + (char * (total - len(field)))
+    return field + (char * (total - display_width(field)))
 
-def expanded_table(rows, headers):
-    header_len = max([len(x) for x in headers])
-    max_row_len = 0
-    results = []
+
+def expanded_records(rows, headers):
+    """Yield each row as a record of "header | value" lines, without a
+    trailing newline. Rows are read one at a time."""
+    header_len = max([display_width(x) for x in headers])
     sep = u"-[ RECORD {0} ]-------------------------\n"
 
     padded_headers = [pad(x, header_len) + u" |" for x in headers]
-    header_len += 2
 
-    for row in rows:
-        row_len = max([len(_text_type(x)) for x in row])
-        row_result = []
-        if row_len > max_row_len:
-            max_row_len = row_len
+    for i, row in enumerate(rows):
+        yield sep.format(i) + '\n'.join(
+            [u"%s %s" % (header, value)
+             for header, value in zip(padded_headers, row)])
 
-        for header, value in zip(padded_headers, row):
-            row_result.append(u"%s %s" % (header, value))
 
-        results.append('\n'.join(row_result))
+def expanded_chunks(rows, headers, batch_size=BATCH_SIZE):
+    """Yield the expanded output in chunks of `batch_size` records, so it
+    can be written while the rows are still being fetched. Joining the
+    chunks with newlines gives the complete output."""
+    records = expanded_records(rows, headers)
+    while True:
+        batch = list(islice(records, batch_size))
+        if not batch:
+            return
+        yield '\n'.join(batch)
 
-    output = []
-    for i, result in enumerate(results):
-        output.append(sep.format(i))
-        output.append(result)
-        output.append('\n')
 
-    return ''.join(output)
+def expanded_table(rows, headers):
+    return ''.join(record + '\n' for record in expanded_records(rows, headers))
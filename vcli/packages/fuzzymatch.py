@@ -0,0 +1,45 @@
+"""Fuzzy matching of completion candidates.
+
+The text matches a name when its characters all appear in the name, in the
+same order. Matches are sorted by the length of the shortest match from the
+first possible start, then by that start, like searching the name for the
+regex 'a.*?b.*?c'.
+
+Each character is looked up with `str.find` after the end of the previous
+one, so no regex is compiled for the text. Nothing is kept between calls,
+since prompt_toolkit may run completions in several threads at once.
+"""
+
+
+def fuzzy_matches(text, candidates, name=None):
+    """Returns the ((length, start), candidate) pairs of the candidates
+    matching `text`, sorted.
+
+    `name` gives the lowercased name to match for a candidate, the candidate
+    itself by default. `text` should be lowercase.
+
+    >>> fuzzy_matches('co', ['order_count', 'customer_id', 'city'])
+    [((2, 6), 'order_count'), ((5, 0), 'customer_id')]
+    >>> fuzzy_matches('cid', ['order_count', 'customer_id', 'city'])
+    [((11, 0), 'customer_id')]
+    """
+    if not text:
+        return sorted(((0, 0), candidate) for candidate in candidates)
+
+    name = name or (lambda candidate: candidate)
+    first, rest = text[0], text[1:]
+    matches = []
+    for candidate in candidates:
+        name_ = name(candidate)
+        start = name_.find(first)
+        if start < 0:
+            continue
+        end = start + 1
+        for char in rest:
+            end = name_.find(char, end) + 1
+            if not end:
+                break
+        else:
+            matches.append(((end - start, start), candidate))
+    matches.sort()
+    return matches
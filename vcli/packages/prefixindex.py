@@ -0,0 +1,64 @@
+"""A set of completion candidates, indexed for prefix matching.
+
+Keywords, functions, datatypes and, with smart completion off, every known
+name are only matched at their start. Instead of checking every candidate on
+each keystroke, `PrefixIndex` keeps the candidates sorted by their lowercased
+text, so the ones starting with a prefix are found by a binary search, in
+O(log n + k) for k matches.
+"""
+from bisect import bisect_left
+
+
+class PrefixIndex(object):
+    """A set of strings that can list those starting with a prefix, ignoring
+    case.
+
+    The sorted index is built with the first lookup after a change, so adding
+    many names at once, as the completion refresh does, only sorts them once.
+
+    >>> index = PrefixIndex(['SELECT', 'SET', 'sales', 'FROM'])
+    >>> sorted(index.startswith('se'))
+    ['SELECT', 'SET']
+    >>> index.add('Session')
+    >>> sorted(index.startswith('ses'))
+    ['Session']
+    """
+
+    def __init__(self, items=()):
+        self.items = set(items)
+        # Lowercased items, sorted, and the items in the same order
+        self._keys = None
+        self._values = None
+
+    def add(self, item):
+        if item not in self.items:
+            self.items.add(item)
+            self._keys = None
+
+    def update(self, items):
+        for item in items:
+            self.add(item)
+
+    def __contains__(self, item):
+        return item in self.items
+
+    def __iter__(self):
+        return iter(self.items)
+
+    def __len__(self):
+        return len(self.items)
+
+    def startswith(self, prefix):
+        """Returns the items starting with `prefix`, which is lowercase."""
+        if self._keys is None:
+            self._build()
+        keys = self._keys
+        start = end = bisect_left(keys, prefix)
+        while end < len(keys) and keys[end].startswith(prefix):
+            end += 1
+        return self._values[start:end]
+
+    def _build(self):
+        pairs = sorted((item.lower(), item) for item in self.items)
+        self._keys = [key for key, _ in pairs]
+        self._values = [item for _, item in pairs]
@@ -0,0 +1,358 @@
+"""Split a buffer of sql into statements and classify them in a single pass.
+
+`sqlparse` builds a full parse tree for every statement, which is far too
+slow for large scripts. Splitting only needs to know where the string
+literals, quoted names, comments and dollar-quoted bodies are, so the
+buffer is scanned with one regular expression that jumps from one of those
+to the next. Each statement is then classified by its leading keyword.
+"""
+import re
+
+from collections import namedtuple
+
+# Statement kinds
+QUERY = 'query'
+DML = 'dml'
+COPY = 'copy'
+DDL = 'ddl'
+SESSION = 'session'
+TRANSACTION = 'transaction'
+SPECIAL = 'special'
+OTHER = 'other'
+
+Statement = namedtuple('Statement', ['sql', 'keyword', 'kind', 'mutating',
+                                     'copy_local', 'search_path', 'line'])
+
+# Approximate number of characters `split_file` reads at a time
+SPLIT_CHUNK_SIZE = 1024 * 1024
+
+_KINDS = {
+    'select': QUERY,
+    'with': QUERY,
+    'insert': DML,
+    'update': DML,
+    'delete': DML,
+    'merge': DML,
+    'copy': COPY,
+    'create': DDL,
+    'alter': DDL,
+    'drop': DDL,
+    'truncate': DDL,
+    'grant': DDL,
+    'revoke': DDL,
+    'comment': DDL,
+    'set': SESSION,
+    'begin': TRANSACTION,
+    'start': TRANSACTION,
+    'commit': TRANSACTION,
+    'rollback': TRANSACTION,
+    'end': TRANSACTION,
+    'abort': TRANSACTION,
+    'savepoint': TRANSACTION,
+    'release': TRANSACTION,
+}
+
+_MUTATING_KINDS = (DML, COPY, DDL)
+
+# Statements that change a single table, and the words that may come before
+# its name
+_TARGET_KEYWORDS = ('insert', 'update', 'delete', 'merge', 'copy', 'truncate')
+_TARGET_SKIPPED = ('into', 'from', 'table', 'only')
+
+_STRING = r"""
+    (?<![\w$])[eE]'[^'\\]*(?:(?:\\.|'')[^'\\]*)*(?:'|\Z)
+  | '[^']*(?:''[^']*)*(?:'|\Z)
+"""
+_NAME = r'"[^"]*(?:""[^"]*)*(?:"|\Z)'
+_COMMENT = r'--[^\n]*|/\*.*?(?:\*/|\Z)'
+_DOLLAR = r'(?<![\w$])\$(?P<tag>(?:[^\W\d]\w*)?)\$.*?(?:\$(?P=tag)\$|\Z)'
+
+# Only matches what matters for splitting, everything in between is skipped.
+# The lookahead quickly rules out the characters none of them can start with.
+_SPLIT_RE = re.compile(r"""
+    (?=[eE'"\-/$;bBcC])
+    (?:
+        (?P<quoted>%s|%s|%s|%s)
+      | (?P<block>(?<![\w$])(?:begin|case|end)(?![\w$]))
+      | (?P<semicolon>;)
+    )
+""" % (_STRING, _NAME, _COMMENT, _DOLLAR),
+    re.VERBOSE | re.DOTALL | re.IGNORECASE | re.UNICODE)
+
+_TOKEN_RE = re.compile(r"""
+    (?P<whitespace>\s+)
+  | (?P<comment>%s)
+  | (?P<string>%s|%s)
+  | (?P<name>%s)
+  | (?P<word>[^\W\d][\w$]*)
+  | (?P<other>.)
+""" % (_COMMENT, _STRING, _DOLLAR, _NAME),
+    re.VERBOSE | re.DOTALL | re.UNICODE)
+
+_LEADING_RE = re.compile(r'(?:\s+|--[^\n]*|/\*.*?(?:\*/|\Z)|\()*', re.DOTALL)
+_KEYWORD_RE = re.compile(r'\\\S*|[^\W\d][\w$]*', re.UNICODE)
+_FUNCTION_RE = re.compile(r'create\s+(?:or\s+replace\s+)?(?:\w+\s+)?function\b',
+                          re.IGNORECASE)
+_SEARCH_PATH_RE = re.compile(r'set\s+search_path\b', re.IGNORECASE)
+
+
+def split_statements(text):
+    """Yield a `Statement` for each of the sql statements in `text`.
+
+    Statements are separated by semicolons, except inside quotes, comments
+    and the BEGIN ... END body of a CREATE FUNCTION. The sql of a statement
+    has no trailing semicolon. Statements that only contain comments are
+    skipped.
+
+    >>> [s.sql for s in split_statements("select ';'; select 2;")]
+    ["select ';'", 'select 2']
+    """
+    splitter = StatementSplitter()
+    for statement in splitter.feed(text):
+        yield statement
+    for statement in splitter.close():
+        yield statement
+
+
+def split_file(f, chunk_size=SPLIT_CHUNK_SIZE):
+    """Like `split_statements`, but reads the text from the file object `f`
+    a few lines at a time. Statements are yielded as soon as they have been
+    read, and only the statement being read is held in memory."""
+    splitter = StatementSplitter()
+    while True:
+        lines = f.readlines(chunk_size)
+        if not lines:
+            break
+        for statement in splitter.feed(''.join(lines)):
+            yield statement
+    for statement in splitter.close():
+        yield statement
+
+
+class StatementSplitter(object):
+    """Incremental statement splitter, the text can be fed in pieces.
+
+    Each piece must end at the end of a line, so that only quotes and
+    comments can continue in the next piece.
+    """
+
+    def __init__(self):
+        self.text = ''
+        # Start of the current statement in `text`
+        self.start = 0
+        # Where to continue scanning `text`
+        self.pos = 0
+        # Depth of BEGIN ... END blocks in a CREATE FUNCTION body
+        self.depth = 0
+        self.in_function = None
+        # Line number of `line_pos` in the whole input
+        self.line = 1
+        self.line_pos = 0
+
+    def feed(self, text):
+        """Add text and yield the statements that it completes."""
+        self.text = self.text[self.start:] + text
+        self.pos -= self.start
+        self.line_pos -= self.start
+        self.start = 0
+        return self._scan(final=False)
+
+    def close(self):
+        """Yield the statements left at the end of the input."""
+        for statement in self._scan(final=True):
+            yield statement
+        statement = self._statement(len(self.text))
+        if statement:
+            yield statement
+
+    def _scan(self, final):
+        text = self.text
+        for match in _SPLIT_RE.finditer(text, self.pos):
+            group = match.lastgroup
+            if group == 'quoted':
+                if match.end() == len(text) and not final:
+                    # It may continue in the next piece
+                    self.pos = match.start()
+                    return
+            elif group == 'semicolon':
+                if self.depth:
+                    continue
+                statement = self._statement(match.start())
+                self.start = self.line_pos = match.end()
+                self.in_function = None
+                if statement:
+                    yield statement
+            else:
+                if self.in_function is None:
+                    self.in_function = bool(_FUNCTION_RE.match(
+                        text, _skip_leading(text, self.start)))
+                if self.in_function:
+                    if match.group().lower() == 'end':
+                        self.depth = max(self.depth - 1, 0)
+                    else:
+                        self.depth += 1
+        self.pos = len(text)
+
+    def _statement(self, end):
+        text = self.text
+        sql = text[self.start:end]
+        first = end - len(sql.lstrip())
+        line = self.line + text.count('\n', self.line_pos, first)
+        self.line = line + text.count('\n', first, end)
+        self.line_pos = end
+        return classify(sql, line)
+
+
+def classify(sql, line=1):
+    """Returns a `Statement` for a single sql statement, or None if it is
+    empty or only contains comments. `line` is the line number the statement
+    starts at.
+
+    >>> classify('  -- load\\nCOPY t FROM LOCAL \\'t.csv\\'')[1:]
+    ('copy', 'copy', True, True, False, 1)
+    """
+    sql = sql.strip()
+    match = _KEYWORD_RE.match(sql, _skip_leading(sql))
+    if not match:
+        return None
+
+    keyword = match.group().lower()
+    if keyword.startswith('\\'):
+        kind = SPECIAL
+    else:
+        kind = _KINDS.get(keyword, OTHER)
+    copy_local = (kind == COPY and
+                  parse_copy_from_local(sql, match.end()) is not None)
+    search_path = bool(kind == SESSION and
+                       _SEARCH_PATH_RE.match(sql, match.start()))
+    return Statement(sql, keyword, kind, kind in _MUTATING_KINDS, copy_local,
+                     search_path, line)
+
+
+def parse_copy_from_local(sql, pos=0):
+    """Split a COPY ... FROM LOCAL statement around its list of files.
+
+    Returns a (head, file_paths, tail) tuple, where head + 'stdin' + tail is
+    the statement to run for each of the files, or None if `sql` isn't a
+    COPY FROM LOCAL statement.
+
+    >>> parse_copy_from_local("copy t from local 'a.csv', 'b''s.csv' direct")
+    ('copy t from ', ['a.csv', "b's.csv"], ' direct')
+    """
+    if not pos:
+        match = _KEYWORD_RE.match(sql, _skip_leading(sql))
+        if not match or match.group().lower() != 'copy':
+            return None
+        pos = match.end()
+
+    tokens = [(m.lastgroup, m.start(), m.end())
+              for m in _TOKEN_RE.finditer(sql, pos)]
+
+    # Search for 'LOCAL' keyword
+    for i, (ttype, tstart, tend) in enumerate(tokens):
+        if ttype == 'word' and sql[tstart:tend].lower() == 'local':
+            break
+    else:
+        return None
+
+    # After 'LOCAL' there should be one or more comma separated file paths
+    file_paths = []
+    expect_path = True
+    for ttype, tstart, tend in tokens[i + 1:]:
+        value = sql[tstart:tend]
+        if ttype in ('whitespace', 'comment'):
+            continue
+        if expect_path and ttype == 'string' and value.startswith("'"):
+            file_paths.append(value[1:-1].replace("''", "'"))
+            end = tend
+            expect_path = False
+        elif not expect_path and value == ',':
+            expect_path = True
+        else:
+            break
+
+    if not file_paths:
+        return None
+
+    head = sql[:tokens[i][1]]
+    return head, file_paths, sql[end:]
+
+
+def normalize(sql):
+    """Returns `sql` with its comments removed, runs of whitespace replaced
+    by a single space and keywords and names in lower case. Two statements
+    that only differ in those ways have the same normal form.
+
+    >>> print(normalize("SELECT  a, 'B' /* b */\\nFROM \\"T\\""))
+    select a, 'B' from "T"
+    """
+    parts = []
+    for match in _TOKEN_RE.finditer(sql.strip()):
+        group = match.lastgroup
+        if group in ('whitespace', 'comment'):
+            if parts and parts[-1] != ' ':
+                parts.append(' ')
+        elif group == 'word':
+            parts.append(match.group().lower())
+        else:
+            parts.append(match.group())
+    return ''.join(parts).strip()
+
+
+def table_names(sql):
+    """Returns the set of names that may refer to a table in `sql`.
+
+    It is a superset: every word and quoted name is included, without its
+    schema, so a table is never missed even when it is only referenced in a
+    subquery.
+
+    >>> sorted(table_names('select a from s.T join "U" on x'))
+    ['U', 'a', 'from', 'join', 'on', 's', 'select', 't', 'x']
+    """
+    names = set()
+    for match in _TOKEN_RE.finditer(sql):
+        group = match.lastgroup
+        if group == 'word':
+            names.add(match.group().lower())
+        elif group == 'name':
+            names.add(match.group()[1:-1].replace('""', '"'))
+    return names
+
+
+def target_table(sql):
+    """Returns the name of the table an INSERT, UPDATE, DELETE, MERGE,
+    COPY or TRUNCATE statement changes, without its schema, or None.
+
+    >>> target_table('INSERT /*+ direct */ INTO public.Sales VALUES (1)')
+    'sales'
+    >>> target_table('truncate table "Sales"')
+    'Sales'
+    """
+    tokens = (m for m in _TOKEN_RE.finditer(sql, _skip_leading(sql))
+              if m.lastgroup not in ('whitespace', 'comment'))
+    keyword = next(tokens, None)
+    if keyword is None or keyword.group().lower() not in _TARGET_KEYWORDS:
+        return None
+
+    parts = []
+    for match in tokens:
+        group, value = match.lastgroup, match.group()
+        if group == 'word':
+            if not parts and value.lower() in _TARGET_SKIPPED:
+                continue
+            parts.append(value.lower())
+        elif group == 'name':
+            parts.append(value[1:-1].replace('""', '"'))
+        else:
+            break
+        # A part of the name may be followed by a '.' and the next part
+        following = next(tokens, None)
+        if following is None or following.group() != '.':
+            break
+    return parts[-1] if parts else None
+
+
+def _skip_leading(text, pos=0):
+    """Returns the position of the first keyword after `pos`, skipping
+    whitespace, comments and opening parentheses."""
+    return _LEADING_RE.match(text, pos).end()
@@ -7,8 +7,8 @@ from __future__ import unicode_literals
 from collections import namedtuple
 from decimal import Decimal
 from platform import python_version_tuple
-from wcwidth import wcswidth
 import re
+from .textwidth import char_width, display_width
 
 
 if python_version_tuple()[0] < "3":
@@ -45,6 +45,9 @@ __version__ = "0.7.4"
 
 MIN_PADDING = 2
 
+# Ends the values that are cut to the maximum column width
+TRUNCATION_MARKER = "\u2026"
+
 
 Line = namedtuple("Line", ["begin", "hline", "sep", "end"])
 
@@ -374,6 +377,43 @@ def _afterpoint(string):
         return -1  # not a number
 
 
+def _number_afterpoint(string):
+    """Like `_afterpoint`, for strings that are known to be formatted numbers.
+
+    >>> _number_afterpoint("123.45"), _number_afterpoint("1e+20"), _number_afterpoint("inf")
+    (2, 3, -1)
+
+    """
+    pos = string.rfind(".")
+    pos = string.lower().rfind("e") if pos < 0 else pos
+    if pos >= 0:
+        return len(string) - pos - 1
+    return -1
+
+
+def _truncate(string, maxwidth):
+    """Shorten a string to `maxwidth` terminal columns, ending it with a
+    marker. Wide characters take two columns.
+
+    >>> _truncate("abcdef", 4) == "abc\u2026", _truncate("abc", 4) == "abc"
+    (True, True)
+    >>> _truncate("\u65e5\u672c\u8a9e\u306e\u6587", 6) == "\u65e5\u672c\u2026"
+    True
+
+    """
+    # No character is wider than two columns
+    if not maxwidth or len(string) * 2 <= maxwidth:
+        return string
+    if display_width(string) <= maxwidth:
+        return string
+    width = 0
+    for i, char in enumerate(string):
+        width += char_width(char)
+        if width > maxwidth - 1:
+            return string[:i] + TRUNCATION_MARKER
+    return string
+
+
 def _padleft(width, s, has_invisible=True):
     """Flush right.
 
@@ -381,8 +421,7 @@ def _padleft(width, s, has_invisible=True):
     True
 
     """
-    lwidth = width - wcswidth(_strip_invisible(s) if has_invisible else s)
-    return ' ' * lwidth + s
+    return _fill_left(width - _visible_width(s, has_invisible), s)
 
 
 def _padright(width, s, has_invisible=True):
@@ -392,8 +431,7 @@ def _padright(width, s, has_invisible=True):
     True
 
     """
-    rwidth = width - wcswidth(_strip_invisible(s) if has_invisible else s)
-    return s + ' ' * rwidth
+    return _fill_right(width - _visible_width(s, has_invisible), s)
 
 
 def _padboth(width, s, has_invisible=True):
@@ -403,9 +441,23 @@ def _padboth(width, s, has_invisible=True):
     True
 
     """
-    xwidth = width - wcswidth(_strip_invisible(s) if has_invisible else s)
-    lwidth = xwidth // 2
-    rwidth =  0 if xwidth <= 0 else lwidth + xwidth % 2
+    return _fill_both(width - _visible_width(s, has_invisible), s)
+
+
+def _fill_left(fill, s):
+    "Add `fill` spaces before the string."
+    return ' ' * fill + s
+
+
+def _fill_right(fill, s):
+    "Add `fill` spaces after the string."
+    return s + ' ' * fill
+
+
+def _fill_both(fill, s):
+    "Split `fill` spaces around the string."
+    lwidth = fill // 2
+    rwidth =  0 if fill <= 0 else lwidth + fill % 2
     return ' ' * lwidth + s + ' ' * rwidth
 
 
@@ -417,20 +469,23 @@ def _strip_invisible(s):
         return re.sub(_invisible_codes_bytes, "", s)
 
 
-def _visible_width(s):
+def _visible_width(s, has_invisible=True):
     """Visible width of a printed string. ANSI color codes are removed.
 
     >>> _visible_width('\x1b[31mhello\x1b[0m'), _visible_width("world")
     (5, 5)
+    >>> _visible_width('\u65e5\u672c\u8a9e')
+    6
 
     """
-    if isinstance(s, _text_type) or isinstance(s, _binary_type):
-        return wcswidth(_strip_invisible(s))
+    if has_invisible and isinstance(s, (_text_type, _binary_type)):
+        return display_width(_strip_invisible(s))
     else:
-        return wcswidth(_text_type(s))
+        return display_width(s)
 
 
-def _align_column(strings, alignment, minwidth=0, has_invisible=True):
+def _align_column(strings, alignment, minwidth=0, has_invisible=True,
+                  numbers=False):
     """[string] -> [padded_string]
 
     >>> list(map(str,_align_column(["12.345", "-1234.5", "1.23", "1234.5", "1e+234", "1.0e234"], "decimal")))
@@ -439,32 +494,41 @@ def _align_column(strings, alignment, minwidth=0, has_invisible=True):
     >>> list(map(str,_align_column(['123.4', '56.7890'], None)))
     ['123.4', '56.7890']
 
+    `numbers` tells that the strings are formatted numbers (or missing
+    values), which are aligned without checking each of them.
+
     """
     if alignment == "right":
         strings = [s.strip() for s in strings]
-        padfn = _padleft
+        fillfn = _fill_left
     elif alignment == "center":
         strings = [s.strip() for s in strings]
-        padfn = _padboth
+        fillfn = _fill_both
     elif alignment == "decimal":
-        decimals = [_afterpoint(s) for s in strings]
+        afterpoint = _number_afterpoint if numbers else _afterpoint
+        decimals = [afterpoint(s) for s in strings]
         maxdecimals = max(decimals)
         strings = [s + (maxdecimals - decs) * " "
                    for s, decs in zip(strings, decimals)]
-        padfn = _padleft
+        fillfn = _fill_left
     elif not alignment:
         return strings
     else:
         strings = [s.strip() for s in strings]
-        padfn = _padright
+        fillfn = _fill_right
 
-    if has_invisible:
+    if numbers:
+        width_fn = len
+    elif has_invisible:
         width_fn = _visible_width
     else:
-        width_fn = wcswidth
+        width_fn = display_width
 
-    maxwidth = max(max(map(width_fn, strings)), minwidth)
-    padded_strings = [padfn(maxwidth, s, has_invisible) for s in strings]
+    # the width of each string is computed once, and reused for padding
+    widths = [width_fn(s) for s in strings]
+    maxwidth = max(max(widths), minwidth)
+    padded_strings = [fillfn(maxwidth - w, s)
+                      for s, w in zip(strings, widths)]
     return padded_strings
 
 
@@ -651,7 +715,7 @@ def _normalize_tabular_data(tabular_data, headers):
 
 def tabulate(tabular_data, headers=[], tablefmt="simple",
              floatfmt="g", numalign="decimal", stralign="left",
-             missingval=""):
+             missingval="", coltypes=None, maxcolwidth=None):
     """Format a fixed width table for pretty printing.
 
     >>> print(tabulate([[1, 2.34], [-56, "8.999"], ["2", "10001"]]))
@@ -708,6 +772,25 @@ def tabulate(tabular_data, headers=[], tablefmt="simple",
     `floatfmt` is a format specification used for columns which
     contain numeric data with a decimal point.
 
+    `coltypes` gives the type of each column (int, float or a string
+    type), or None where it should be detected. Columns of a known
+    type are not checked value by value:
+
+    >>> print(tabulate([["1", 2.5], ["22", 3]], coltypes=[str, float]))
+    --  ---
+    1   2.5
+    22  3
+    --  ---
+
+    Text values wider than `maxcolwidth` columns are cut, and end with
+    `TRUNCATION_MARKER`:
+
+    >>> print(tabulate([["spam", 1], ["bacon and eggs", 2]], maxcolwidth=6))
+    ------  -
+    spam    1
+    bacon…  2
+    ------  -
+
     `None` values are replaced with a `missingval` string:
 
     >>> print(tabulate([["spam", 1, None],
@@ -884,27 +967,38 @@ def tabulate(tabular_data, headers=[], tablefmt="simple",
         tabular_data = []
     list_of_lists, headers = _normalize_tabular_data(tabular_data, headers)
 
+    cols = list(zip(*list_of_lists))
+    coltypes = list(coltypes or [])
+    coltypes += [None] * (len(cols) - len(coltypes))
+    # columns known to only hold numbers can't contain control codes either
+    numbers = [ct in [int,float] for ct in coltypes]
+
     # optimization: look for ANSI control codes once,
     # enable smart width functions only if a control code is found
     plain_text = '\n'.join(['\t'.join(map(_text_type, headers))] + \
-                            ['\t'.join(map(_text_type, row)) for row in list_of_lists])
+                            ['\t'.join(map(_text_type, c))
+                             for c, n in zip(cols, numbers) if not n])
     has_invisible = re.search(_invisible_codes, plain_text)
     if has_invisible:
         width_fn = _visible_width
     else:
-        width_fn = wcswidth
+        width_fn = display_width
 
     # format rows and columns, convert numeric values to strings
-    cols = list(zip(*list_of_lists))
-    coltypes = list(map(_column_type, cols))
+    coltypes = [ct or _column_type(c) for c, ct in zip(cols, coltypes)]
     cols = [[_format(v, ct, floatfmt, missingval) for v in c]
              for c,ct in zip(cols, coltypes)]
+    if maxcolwidth:
+        # before alignment, so that only what is shown gets padded
+        cols = [[_truncate(v, maxcolwidth) for v in c]
+                if ct not in [int,float] else c
+                for c, ct in zip(cols, coltypes)]
 
     # align columns
     aligns = [numalign if ct in [int,float] else stralign for ct in coltypes]
     minwidths = [width_fn(h) + MIN_PADDING for h in headers] if headers else [0]*len(cols)
-    cols = [_align_column(c, a, minw, has_invisible)
-            for c, a, minw in zip(cols, aligns, minwidths)]
+    cols = [_align_column(c, a, minw, has_invisible, n)
+            for c, a, minw, n in zip(cols, aligns, minwidths, numbers)]
 
     if headers:
         # align headers and add headers
@@ -961,6 +1055,37 @@ def _pad_row(cells, padding):
         return cells
 
 
+def _compile_row(rowfmt, padding, colwidths, colaligns):
+    """Return a function of the aligned cells of a row, which gives the same
+    line as `_build_row(_pad_row(cells, padding), colwidths, colaligns,
+    rowfmt)`.
+
+    For a DataRow the separators and the padding are joined into a template
+    once, so each row only takes a single string formatting.
+
+    >>> build = _compile_row(DataRow("|", "|", "|"), 1, [5, 5], ["left"] * 2)
+    >>> print(build(["a    ", "100% "]))
+    | a     | 100%  |
+    """
+    if not rowfmt:
+        return lambda cells: None
+    if hasattr(rowfmt, "__call__"):
+        return lambda cells: rowfmt(_pad_row(cells, padding), colwidths,
+                                    colaligns)
+    begin, sep, end = [s.replace("%", "%%") for s in rowfmt]
+    pad = " "*padding
+    template = begin + sep.join([pad + "%s" + pad] * len(colwidths)) + end
+
+    def build(cells):
+        try:
+            return (template % tuple(cells)).rstrip()
+        except TypeError:
+            # not as many cells as columns
+            return _build_simple_row(_pad_row(cells, padding), rowfmt)
+
+    return build
+
+
 def _format_table(fmt, headers, rows, colwidths, colaligns):
     """Produce a plain-text representation of the table."""
     lines = []
@@ -970,7 +1095,7 @@ def _format_table(fmt, headers, rows, colwidths, colaligns):
 
     padded_widths = [(w + 2*pad) for w in colwidths]
     padded_headers = _pad_row(headers, pad)
-    padded_rows = [_pad_row(row, pad) for row in rows]
+    build_row = _compile_row(fmt.datarow, pad, padded_widths, colaligns)
 
     if fmt.lineabove and "lineabove" not in hidden:
         lines.append(_build_line(padded_widths, colaligns, fmt.lineabove))
@@ -980,16 +1105,16 @@ def _format_table(fmt, headers, rows, colwidths, colaligns):
         if fmt.linebelowheader and "linebelowheader" not in hidden:
             lines.append(_build_line(padded_widths, colaligns, fmt.linebelowheader))
 
-    if padded_rows and fmt.linebetweenrows and "linebetweenrows" not in hidden:
+    if rows and fmt.linebetweenrows and "linebetweenrows" not in hidden:
+        between = _build_line(padded_widths, colaligns, fmt.linebetweenrows)
         # initial rows with a line below
-        for row in padded_rows[:-1]:
-            lines.append(_build_row(row, padded_widths, colaligns, fmt.datarow))
-            lines.append(_build_line(padded_widths, colaligns, fmt.linebetweenrows))
+        for row in rows[:-1]:
+            lines.append(build_row(row))
+            lines.append(between)
         # the last row without a line below
-        lines.append(_build_row(padded_rows[-1], padded_widths, colaligns, fmt.datarow))
+        lines.append(build_row(rows[-1]))
     else:
-        for row in padded_rows:
-            lines.append(_build_row(row, padded_widths, colaligns, fmt.datarow))
+        lines.extend([build_row(row) for row in rows])
 
     if fmt.linebelow and "linebelow" not in hidden:
         lines.append(_build_line(padded_widths, colaligns, fmt.linebelow))
@@ -0,0 +1,64 @@
+# -*- coding: utf-8 -*-
+"""Width of text in terminal columns.
+
+Most values are plain ASCII, where the width is the length of the string, so
+a single regex search decides whether the characters need to be looked at.
+Otherwise the width of each character comes from `wcwidth`: East Asian wide
+characters take two columns, combining characters none. The widths are kept
+in a table, since the same characters keep coming up in a result.
+
+Unlike `wcwidth.wcswidth`, which gives -1 for a whole string that holds a
+control character, control characters count as zero columns.
+"""
+import re
+
+from wcwidth import wcwidth
+
+from ..encodingutils import PY2
+
+if PY2:
+    text_type = unicode
+else:
+    text_type = str
+
+# Anything but printable ASCII, whose characters are one column wide each
+_not_printable_ascii = re.compile(u'[^\x20-\x7e]')
+
+# Width of each character that was not printable ASCII
+_char_widths = {}
+
+
+def char_width(char):
+    """Number of columns taken by a single character.
+
+    >>> char_width(u'a'), char_width(u'日'), char_width(u'\x07')
+    (1, 2, 0)
+    """
+    try:
+        return _char_widths[char]
+    except KeyError:
+        width = _char_widths[char] = max(wcwidth(char), 0)
+        return width
+
+
+def display_width(text):
+    """Number of columns taken by `text` in a terminal.
+
+    >>> display_width(u'abc'), display_width(u'日本語')
+    (3, 6)
+    """
+    if not isinstance(text, text_type):
+        if isinstance(text, bytes):
+            text = text.decode('utf-8', 'replace')
+        else:
+            text = text_type(text)
+    if not _not_printable_ascii.search(text):
+        return len(text)
+    widths = _char_widths
+    width = 0
+    for char in text:
+        try:
+            width += widths[char]
+        except KeyError:
+            width += char_width(char)
+    return width
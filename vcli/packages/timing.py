@@ -0,0 +1,144 @@
+"""Timing of the stages of a query, for `\\timing verbose` and `\\timing stats`.
+"""
+from bisect import bisect_left
+from collections import deque
+from time import time
+
+# Stages in the order they are reported
+STAGES = ('execute', 'first row', 'fetch', 'format', 'output')
+
+# Upper bounds of the histogram buckets, in seconds
+BUCKETS = (0.001, 0.01, 0.1, 0.5, 1, 5, 10, 60, 300)
+
+# Number of queries the session histogram keeps
+HISTORY_SIZE = 1000
+
+
+class StageTimer(object):
+    """Adds up the time spent in each stage of running a query.
+
+    The stages overlap: rows are fetched while the table is formatted, and
+    the table is formatted while it is being written. The time measured
+    around the outer stage includes the inner ones, which are subtracted
+    when the breakdown is reported.
+    """
+
+    def __init__(self):
+        self.start = time()
+        self.seconds = dict((stage, 0.0) for stage in STAGES)
+
+    def timed(self, iterable, stage):
+        """Wrap an iterator, adding the time spent waiting for each of its
+        items to `stage`."""
+        seconds = self.seconds
+        iterator = iter(iterable)
+        while True:
+            start = time()
+            try:
+                item = next(iterator)
+            except StopIteration:
+                seconds[stage] += time() - start
+                return
+            seconds[stage] += time() - start
+            yield item
+
+    def rows(self, cur):
+        """Wrap the rows of a cursor, timing the first row separately."""
+        rows = cur.iterate() if hasattr(cur, 'iterate') else iter(cur)
+        start = time()
+        for row in rows:
+            self.seconds['first row'] += time() - start
+            yield row
+            break
+        else:
+            self.seconds['first row'] += time() - start
+            return
+
+        for row in self.timed(rows, 'fetch'):
+            yield row
+
+    def add(self, stage, seconds):
+        self.seconds[stage] += seconds
+
+    def elapsed(self):
+        return time() - self.start
+
+    def breakdown(self):
+        """Returns [(stage, seconds)], with the overlap between the stages
+        taken out."""
+        seconds = dict(self.seconds)
+        fetched = seconds['first row'] + seconds['fetch']
+        seconds['format'] = max(seconds['format'] - fetched, 0)
+        seconds['output'] = max(seconds['output'] - self.seconds['format'],
+                                0)
+        return [(stage, seconds[stage]) for stage in STAGES]
+
+    def report(self):
+        """
+        >>> timer = StageTimer()
+        >>> timer.seconds.update({'execute': 0.5, 'fetch': 1, 'format': 1.5})
+        >>> timer.report().split(' (')[1]
+        'execute 0.500s, first row 0.000s, fetch 1.000s, format 0.500s, output 0.000s)'
+        """
+        return 'Time: %0.03fs (%s)' % (self.elapsed(), ', '.join(
+            '%s %0.03fs' % item for item in self.breakdown()))
+
+
+class TimingHistogram(object):
+    """Total times of the last `size` queries of the session."""
+
+    def __init__(self, size=HISTORY_SIZE):
+        self.times = deque(maxlen=size)
+
+    def add(self, seconds):
+        self.times.append(seconds)
+
+    def reset(self):
+        self.times.clear()
+
+    def buckets(self):
+        """Returns [(label, count)] for each of the histogram buckets.
+
+        >>> h = TimingHistogram()
+        >>> for seconds in (0.0005, 0.02, 0.03, 2):
+        ...     h.add(seconds)
+        >>> [b for b in h.buckets() if b[1]]
+        [('< 1ms', 1), ('10ms - 100ms', 2), ('1s - 5s', 1)]
+        """
+        counts = [0] * (len(BUCKETS) + 1)
+        for seconds in self.times:
+            counts[bisect_left(BUCKETS, seconds)] += 1
+
+        labels = ['< %s' % _duration(BUCKETS[0])]
+        labels.extend('%s - %s' % (_duration(low), _duration(high))
+                      for low, high in zip(BUCKETS, BUCKETS[1:]))
+        labels.append('>= %s' % _duration(BUCKETS[-1]))
+        return list(zip(labels, counts))
+
+    def rows(self, width=40):
+        """Returns [(label, count, bar)], the bars are scaled to `width`."""
+        buckets = self.buckets()
+        most = max(count for _, count in buckets) or 1
+        return [(label, count, '#' * int(round(count * float(width) / most)))
+                for label, count in buckets]
+
+    def summary(self):
+        times = sorted(self.times)
+        if not times:
+            return 'No queries timed yet.'
+        return ('Queries: %d, min %0.03fs, median %0.03fs, p95 %0.03fs, '
+                'max %0.03fs' % (len(times), times[0], _percentile(times, 50),
+                                 _percentile(times, 95), times[-1]))
+
+
+def _percentile(sorted_times, percent):
+    index = int(round(percent / 100.0 * (len(sorted_times) - 1)))
+    return sorted_times[index]
+
+
+def _duration(seconds):
+    if seconds < 1:
+        return '%dms' % round(seconds * 1000)
+    if seconds < 60:
+        return '%ds' % seconds
+    return '%dm' % (seconds // 60)
@@ -1,14 +1,23 @@
+import io
 import re
 import logging
+import sys
 from codecs import open
 from os.path import expanduser
+from time import time
 import click
 from .namedqueries import namedqueries
-from .main import special_command, NO_QUERY
+from .main import special_command, EXECUTOR_QUERY, NO_QUERY
 from . import export
+from ..splitter import COPY, DML, OTHER, QUERY, SPECIAL, split_file
+from ...verror import format_error
 
 _logger = logging.getLogger(__name__)
 
+# Kinds of statements whose result is shown by \i. DML and COPY statements
+# have a one cell result instead, the number of rows they changed.
+_RESULT_KINDS = (QUERY, OTHER)
+
 
 @export
 def editor_command(command):
@@ -68,24 +77,172 @@ def open_external_editor(filename=None, sql=''):
 
     return (query, message)
 
-@special_command('\\i', '\\i FILE', 'Execute commands from file')
-def execute_from_file(cur, pattern, **_):
-    if pattern:
-        try:
-            query = read_from_file(pattern)
-        except IOError as e:
-            message = 'Error reading file: %s' % pattern
-            message = message + ' Error was: ' + str(e)
-            return [(None, None, None, message, True)]
-    else:
+@special_command('\\i', '\\i[+] FILE [continue]', 'Execute commands from file',
+                 arg_type=EXECUTOR_QUERY)
+def execute_from_file(executor, pattern, verbose=False, **_):
+    """Run the statements in a file one at a time, as the file is read.
+
+    A progress counter is shown on stderr, `\\i+` lists every statement
+    with its timing instead. The script stops at the first failed statement
+    unless `continue` follows the file name.
+    """
+    if not pattern:
         message = '\\i: missing required argument'
         return [(None, None, None, message, True)]
-    cur.execute(query)
-    if cur.description:
-        headers = [x[0] for x in cur.description]
-        return [(None, cur, headers, cur.statusmessage, False)]
-    else:
-        return [(None, None, None, cur.statusmessage, True)]
+
+    path, continue_on_error = pattern, False
+    words = pattern.rsplit(None, 1)
+    if len(words) == 2 and words[1].lower() == 'continue':
+        path, continue_on_error = words[0], True
+
+    try:
+        f = io.open(expanduser(path), encoding='utf-8')
+    except IOError as e:
+        message = 'Error reading file: %s' % path
+        message = message + ' Error was: ' + str(e)
+        return [(None, None, None, message, True)]
+
+    return run_script(executor, f, path, verbose, continue_on_error)
+
+
+def run_script(executor, f, path, verbose=False, continue_on_error=False):
+    """Yield the results of the statements in file object `f`.
+
+    Each statement goes through `executor` like a typed one, so COPY FROM
+    LOCAL, the result cache and the session state work the same in scripts.
+    Only queries, and the statements of kinds that aren't known not to
+    return rows, have a result. The summary status at the end has the number
+    of rows changed by DML and COPY statements.
+    """
+    progress = ScriptProgress(path, verbose)
+    count = failed = 0
+    changed = None
+    start = time()
+
+    with f:
+        for statement in split_file(f):
+            count += 1
+            progress.started(count, statement)
+            statement_start = time()
+            cur = executor.cursor()
+            try:
+                if statement.kind == SPECIAL:
+                    raise ValueError('Special commands are not supported in '
+                                     'scripts: %s' % statement.keyword)
+                copy_result = executor.execute_statement(cur, statement)
+            except Exception as e:
+                failed += 1
+                if not continue_on_error:
+                    # The error itself is shown by the caller
+                    progress.failed(count, statement)
+                    raise
+                progress.failed(count, statement, e)
+                if hasattr(cur, 'flush_to_query_ready'):
+                    cur.flush_to_query_ready()
+                continue
+            progress.finished(count, statement, time() - statement_start)
+
+            if copy_result is not None:
+                # The report of a COPY FROM LOCAL of several files
+                _, rows, headers, status, _ = copy_result
+                changed = (changed or 0) + sum(row[1] for row in rows
+                                               if row[1] is not None)
+                progress.clear()
+                yield ('> %s' % _summary(statement.sql), rows, headers,
+                       status, False)
+                continue
+            if not cur.description:
+                continue
+            if statement.kind in _RESULT_KINDS:
+                headers = [x[0] for x in cur.description]
+                progress.clear()
+                yield ('> %s' % _summary(statement.sql), cur, headers, None,
+                       False)
+            else:
+                rows = _changed_rows(cur)
+                if statement.kind in (DML, COPY):
+                    changed = (changed or 0) + rows
+
+    progress.clear()
+    status = 'Ran %d statements from %s in %.3fs' % (count, path,
+                                                       time() - start)
+    if changed is not None:
+        status += ', %d rows changed' % changed
+    if failed:
+        status += ', %d failed' % failed
+    yield (None, None, None, status + '.', True)
+
+
+class ScriptProgress(object):
+    """Shows the progress of a script on stderr.
+
+    On a terminal a single line is updated with the number and timing of the
+    last statement. In verbose mode each statement gets a line of its own.
+    """
+
+    def __init__(self, path, verbose=False, output=None):
+        self.path = path
+        self.verbose = verbose
+        self.output = output or sys.stderr
+        self.live = not verbose and self.output.isatty()
+        self.width = 0
+
+    def started(self, number, statement):
+        if self.live:
+            self._show('%s: statement %d (line %d) ...' % (
+                self.path, number, statement.line))
+
+    def finished(self, number, statement, seconds):
+        if self.verbose:
+            click.echo('[%d] line %d: %.3fs  %s' % (
+                number, statement.line, seconds, _summary(statement.sql)),
+                file=self.output)
+        elif self.live:
+            self._show('%s: statement %d (line %d) %.3fs' % (
+                self.path, number, statement.line, seconds))
+
+    def failed(self, number, statement, error=None):
+        self.clear()
+        click.secho('%s: statement %d (line %d) failed: %s' % (
+            self.path, number, statement.line, _summary(statement.sql)),
+            file=self.output, fg='red')
+        if error is not None:
+            click.secho(format_error(error), file=self.output, fg='red')
+
+    def clear(self):
+        """Erase the progress line, before other output is written."""
+        if self.width:
+            click.echo('\r%s\r' % (' ' * self.width), file=self.output,
+                       nl=False)
+            self.width = 0
+
+    def _show(self, text):
+        padding = ' ' * max(self.width - len(text), 0)
+        click.echo('\r' + text + padding, file=self.output, nl=False)
+        self.width = len(text)
+
+
+def _changed_rows(cur):
+    """Reads the rest of a result that isn't shown, and returns its first
+    value if it is a row count."""
+    row = cur.fetchone()
+    if hasattr(cur, 'flush_to_query_ready'):
+        cur.flush_to_query_ready()
+    try:
+        return int(row[0])
+    except (TypeError, ValueError, IndexError):
+        return 0
+
+
+def _summary(sql, width=60):
+    """The first line of a statement, shortened to `width` characters."""
+    line = sql.split('\n', 1)[0]
+    if len(line) > width:
+        return line[:width - 3] + '...'
+    if line != sql:
+        return line + ' ...'
+    return line
+
 
 def read_from_file(path):
     with open(expanduser(path), encoding='utf-8') as f:
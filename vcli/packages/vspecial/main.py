@@ -6,12 +6,16 @@ import sys
 from collections import namedtuple
 
 from . import export
+from ..timing import TimingHistogram
 
 log = logging.getLogger(__name__)
 
 NO_QUERY = 0
 PARSED_QUERY = 1
 RAW_QUERY = 2
+# The handler gets the VExecute instead of a cursor, to run statements the
+# way they are run when typed
+EXECUTOR_QUERY = 3
 
 SpecialCommand = namedtuple('SpecialCommand', [
     'handler', 'syntax', 'description', 'arg_type', 'hidden',
@@ -40,6 +44,9 @@ class VSpecial(object):
         self.show_header = True
         self.output = sys.stdout
         self.timing_enabled = False
+        # Report the time of each stage of a query, not just the total
+        self.timing_verbose = False
+        self.timing_histogram = TimingHistogram()
         self.expanded_output = False
 
         self.register(self.toggle_align, '\\a', '\\a', 'Aligned or unaligned',
@@ -56,13 +63,14 @@ class VSpecial(object):
         self.register(self.toggle_expanded_output, '\\x', '\\x',
                       'Toggle expanded output', arg_type=NO_QUERY)
 
-        self.register(self.toggle_timing, '\\timing', '\\timing',
-                      'Toggle timing of commands', arg_type=NO_QUERY)
+        self.register(self.toggle_timing, '\\timing',
+                      '\\timing [on|off|verbose|stats|reset]',
+                      'Toggle timing of commands', arg_type=PARSED_QUERY)
 
     def register(self, *args, **kwargs):
         register_special_command(*args, command_dict=self.commands, **kwargs)
 
-    def execute(self, cur, sql):
+    def execute(self, cur, sql, executor=None):
         commands = self.commands
         command, verbose, pattern = parse_special_command(sql)
 
@@ -82,6 +90,9 @@ class VSpecial(object):
             return special_cmd.handler(cur=cur, pattern=pattern, verbose=verbose)
         elif special_cmd.arg_type == RAW_QUERY:
             return special_cmd.handler(cur=cur, query=sql)
+        elif special_cmd.arg_type == EXECUTOR_QUERY:
+            return special_cmd.handler(executor=executor, pattern=pattern,
+                                       verbose=verbose)
 
     def toggle_align(self):
         self.aligned = not self.aligned
@@ -131,10 +142,39 @@ class VSpecial(object):
         message += u"on." if self.expanded_output else u"off."
         return [(None, None, None, message, True)]
 
-    def toggle_timing(self):
-        self.timing_enabled = not self.timing_enabled
+    def toggle_timing(self, pattern='', **_):
+        """Toggle timing, or set it to on, off or verbose.
+
+        `\\timing stats` shows a histogram of the query times of the session
+        and `\\timing reset` clears it.
+        """
+        pattern = pattern.lower()
+        if pattern == 'stats':
+            histogram = self.timing_histogram
+            return [(None, histogram.rows(), ['Time', 'Queries', ''],
+                     histogram.summary(), True)]
+        elif pattern == 'reset':
+            self.timing_histogram.reset()
+            return [(None, None, None, 'Timing statistics cleared.', True)]
+        elif pattern in ('on', 'verbose'):
+            self.timing_enabled = True
+            self.timing_verbose = pattern == 'verbose'
+        elif pattern == 'off':
+            self.timing_enabled = False
+        elif pattern:
+            return [(None, None, None, '\\timing: unknown option "%s"'
+                     % pattern, True)]
+        else:
+            self.timing_enabled = not self.timing_enabled
+            self.timing_verbose = False
+
         message = "Timing is "
-        message += "on." if self.timing_enabled else "off."
+        if not self.timing_enabled:
+            message += "off."
+        elif self.timing_verbose:
+            message += "on, with a breakdown by stage."
+        else:
+            message += "on."
         return [(None, None, None, message, True)]
 
 
@@ -0,0 +1,231 @@
+"""Streaming table rendering for large result sets.
+
+`tabulate` needs every row in memory before it can print anything, because
+column widths depend on the widest value of each column. `stream_tabulate`
+picks the column types and widths from a bounded sample of leading rows
+instead, and then formats the remaining rows in batches as they are read from
+the cursor.
+
+When the column types are known from the cursor description, they are used
+instead of checking the type of every value.
+"""
+from itertools import islice
+
+from . import columnar
+from .textwidth import display_width
+from .tabulate import (TableFormat, MIN_PADDING, _table_formats, _text_type,
+                       _invisible_codes, _column_type, _format, _afterpoint,
+                       _number_afterpoint, _align_column, _align_header,
+                       _padleft, _padright, _padboth, _visible_width,
+                       _pad_row, _build_row, _build_line, _compile_row,
+                       _truncate,
+                       tabulate)
+
+
+# Number of leading rows used to choose column types and widths
+SAMPLE_SIZE = 1000
+
+# Number of rows formatted and joined into a single output chunk
+BATCH_SIZE = 1000
+
+# Column types of the Vertica data types, the others are detected from the
+# values. Like `tabulate`, booleans, numerics and dates are shown as text.
+_COLUMN_TYPES = dict((type_code, _text_type) for type_code in (
+    columnar.BOOLEAN, columnar.CHAR, columnar.VARCHAR, columnar.LONG_VARCHAR,
+    columnar.NUMERIC, columnar.DATE, columnar.TIME, columnar.TIME_TZ,
+    columnar.TIMESTAMP, columnar.TIMESTAMP_TZ, columnar.INTERVAL))
+_COLUMN_TYPES[columnar.INTEGER] = int
+_COLUMN_TYPES[columnar.FLOAT] = float
+
+
+def column_types(description):
+    """Returns the column types for `stream_tabulate` from a cursor
+    description, None for the columns whose type should be detected.
+
+    >>> column_types([('id', 6), ('name', 9), ('data', 17)]) == [
+    ...     int, _text_type, None]
+    True
+    """
+    if not description:
+        return None
+    types = []
+    for column in description:
+        try:
+            types.append(_COLUMN_TYPES.get(column[1]))
+        except (IndexError, TypeError):
+            types.append(None)
+    return types
+
+
+def stream_tabulate(rows, headers=(), tablefmt='simple', floatfmt='g',
+                    numalign='decimal', stralign='left', missingval='',
+                    sample_size=SAMPLE_SIZE, batch_size=BATCH_SIZE,
+                    coltypes=None, maxcolwidth=None):
+    """Yield a formatted table as a sequence of text chunks.
+
+    When all the rows fit in the sample the whole table is rendered by
+    `tabulate` and yielded as one chunk, so small results look exactly the
+    same as before. Otherwise the layout computed from the sample is reused
+    for the rest of the rows; values wider than the sampled column width
+    overflow their cell instead of re-aligning the rows already printed.
+
+    `coltypes` are the types from `column_types`, if they are known. Text
+    values wider than `maxcolwidth` are cut, see `tabulate`.
+
+    Joining the chunks with newlines gives the complete table.
+    """
+    rows = iter(rows)
+    sample = list(islice(rows, sample_size))
+    if len(sample) < sample_size:
+        yield tabulate(sample, list(headers), tablefmt=tablefmt,
+                       floatfmt=floatfmt, numalign=numalign,
+                       stralign=stralign, missingval=missingval,
+                       coltypes=coltypes, maxcolwidth=maxcolwidth)
+        return
+
+    if not isinstance(tablefmt, TableFormat):
+        tablefmt = _table_formats.get(tablefmt, _table_formats['simple'])
+
+    layout = _Layout(sample, [_text_type(h) for h in headers], floatfmt,
+                     numalign, stralign, missingval, coltypes, maxcolwidth)
+
+    batches = _batches(sample, rows, batch_size)
+    for chunk in _stream_table(tablefmt, layout, batches):
+        yield chunk
+
+
+def _batches(sample, rows, batch_size):
+    for start in range(0, len(sample), batch_size):
+        yield sample[start:start + batch_size]
+    while True:
+        batch = list(islice(rows, batch_size))
+        if not batch:
+            return
+        yield batch
+
+
+class _Layout(object):
+    """Column types, alignments and widths chosen from a sample of rows."""
+
+    def __init__(self, sample, headers, floatfmt, numalign, stralign,
+                 missingval, coltypes=None, maxcolwidth=None):
+        self.floatfmt = floatfmt
+        self.missingval = missingval
+        self.maxcolwidth = maxcolwidth
+
+        cols = list(zip(*sample))
+        coltypes = list(coltypes or [])
+        coltypes += [None] * (len(cols) - len(coltypes))
+        # Columns known to hold numbers don't need to be checked for control
+        # codes, or for the position of the decimal point
+        self.numbers = [ct in (int, float) for ct in coltypes]
+
+        plain_text = '\n'.join(['\t'.join(map(_text_type, headers))] +
+                               ['\t'.join(map(_text_type, c))
+                                for c, n in zip(cols, self.numbers) if not n])
+        self.has_invisible = bool(_invisible_codes.search(plain_text))
+        width_fn = _visible_width if self.has_invisible else display_width
+
+        self.coltypes = [ct or _column_type(c)
+                         for c, ct in zip(cols, coltypes)]
+        cols = [[self._format_value(v, ct) for v in c]
+                for c, ct in zip(cols, self.coltypes)]
+
+        self.aligns = [numalign if ct in (int, float) else stralign
+                       for ct in self.coltypes]
+        self.afterpoints = [_number_afterpoint if n else _afterpoint
+                            for n in self.numbers]
+        self.maxdecimals = [max(map(f, c)) if a == 'decimal' else 0
+                            for c, a, f in zip(cols, self.aligns,
+                                               self.afterpoints)]
+
+        if headers:
+            minwidths = [width_fn(h) + MIN_PADDING for h in headers]
+        else:
+            minwidths = [0] * len(cols)
+        cols = [_align_column(c, a, minw, self.has_invisible, n)
+                for c, a, minw, n in zip(cols, self.aligns, minwidths,
+                                         self.numbers)]
+        self.widths = [max(minw, width_fn(c[0]))
+                       for minw, c in zip(minwidths, cols)]
+
+        if headers:
+            self.headers = [_align_header(h, a, w) for h, a, w
+                            in zip(headers, self.aligns, self.widths)]
+        else:
+            self.headers = []
+
+    def _format_value(self, value, coltype):
+        try:
+            s = _format(value, coltype, self.floatfmt, self.missingval)
+        except ValueError:
+            # A value outside of the sample that doesn't fit the column type
+            s = _format(value, _text_type, self.floatfmt, self.missingval)
+            coltype = _text_type
+        if self.maxcolwidth and coltype not in (int, float):
+            # Cut before padding, so that only what is shown gets padded
+            s = _truncate(s, self.maxcolwidth)
+        return s
+
+    def format_row(self, row):
+        """Format and pad the values of a single row."""
+        cells = []
+        for value, coltype, align, width, maxdec, afterpoint in zip(
+                row, self.coltypes, self.aligns, self.widths,
+                self.maxdecimals, self.afterpoints):
+            s = self._format_value(value, coltype)
+            if align == 'decimal':
+                s = _padleft(width, s + (maxdec - afterpoint(s)) * ' ',
+                             self.has_invisible)
+            elif align == 'right':
+                s = _padleft(width, s.strip(), self.has_invisible)
+            elif align == 'center':
+                s = _padboth(width, s.strip(), self.has_invisible)
+            elif align:
+                s = _padright(width, s.strip(), self.has_invisible)
+            cells.append(s)
+        return cells
+
+
+def _stream_table(fmt, layout, batches):
+    """Yield the lines of a table, one chunk per batch of rows.
+
+    This mirrors `tabulate._format_table`, except that the data rows come
+    from an iterator of batches instead of a list.
+    """
+    headers = layout.headers
+    aligns = layout.aligns
+    hidden = fmt.with_header_hide if (headers and fmt.with_header_hide) else []
+    pad = fmt.padding
+    padded_widths = [(w + 2 * pad) for w in layout.widths]
+
+    lines = []
+    if fmt.lineabove and 'lineabove' not in hidden:
+        lines.append(_build_line(padded_widths, aligns, fmt.lineabove))
+    if headers:
+        lines.append(_build_row(_pad_row(headers, pad), padded_widths, aligns,
+                                fmt.headerrow))
+        if fmt.linebelowheader and 'linebelowheader' not in hidden:
+            lines.append(_build_line(padded_widths, aligns,
+                                     fmt.linebelowheader))
+    if lines:
+        yield '\n'.join(lines)
+
+    build_row = _compile_row(fmt.datarow, pad, padded_widths, aligns)
+    format_row = layout.format_row
+    between = None
+    if fmt.linebetweenrows and 'linebetweenrows' not in hidden:
+        between = _build_line(padded_widths, aligns, fmt.linebetweenrows)
+
+    first = True
+    for batch in batches:
+        lines = []
+        for row in batch:
+            if between is not None and not first:
+                lines.append(between)
+            first = False
+            lines.append(build_row(format_row(row)))
+        yield '\n'.join(lines)
+
+    if fmt.linebelow and 'linebelow' not in hidden:
+        yield _build_line(padded_widths, aligns, fmt.linebelow)
@@ -0,0 +1,269 @@
+"""Client side cache for the results of read-only queries, for `\\cache`.
+
+Results are keyed by the normalized sql, the database and the search path,
+and kept in memory for a limited time. The least recently used results are
+evicted once the cache holds more than its byte limit. A statement that
+changes a table drops the cached results of the queries that mention it,
+DDL drops all of them, and so does a rollback, since the cached results may
+have included the changes that it undid.
+
+Queries that call a function with a side effect, such as the Vertica
+meta-functions ANALYZE_STATISTICS or PURGE_TABLE, or whose result changes on
+each call, like NEXTVAL, are never cached.
+
+Changes made by other sessions, or through a view that is queried under
+another name, are only picked up once the cached result expires.
+"""
+import logging
+import re
+import threading
+
+from collections import namedtuple
+from time import time
+
+try:
+    from collections import OrderedDict
+except ImportError:
+    from .packages.ordereddict import OrderedDict
+
+from .packages.columnar import ColumnarRows
+from .packages.splitter import (DDL, QUERY, classify, normalize, table_names,
+                                target_table)
+
+_logger = logging.getLogger(__name__)
+
+# Defaults of the result_cache_ttl and result_cache_size settings, the size
+# is in megabytes
+DEFAULT_TTL = 300
+DEFAULT_SIZE = 64
+
+# Number of rows between checks of the size of a result that is being stored
+SIZE_CHECK_INTERVAL = 1000
+
+# Functions that change something or whose result changes on each call, by
+# name prefix, which covers the families of Vertica meta-functions
+_VOLATILE_FUNCTIONS = (
+    'alter_', 'analyze_', 'audit', 'cancel_', 'clear_', 'close_', 'copy_',
+    'create_', 'currval', 'designer_', 'disable_', 'do_tm_task', 'drop_',
+    'enable_', 'export_', 'flush_', 'install_', 'interrupt_', 'last_insert_id',
+    'make_', 'mark_', 'move_', 'nextval', 'purge', 'random', 'rebalance_',
+    'refresh', 'reset_', 'restore_', 'set_', 'shutdown', 'start_', 'stop_',
+    'swap_', 'sync_', 'uuid_generate')
+
+_VOLATILE_CALL_RE = re.compile(r'(?<![\w$])(?:%s)\w*\s*\(' % '|'.join(
+    _VOLATILE_FUNCTIONS), re.IGNORECASE)
+
+CacheEntry = namedtuple('CacheEntry', ['description', 'rows', 'size',
+                                       'names', 'created'])
+
+
+class ResultCache(object):
+    """Results of queries, keyed by (normalized sql, database, search path).
+
+    A ttl of zero disables the cache.
+    """
+
+    def __init__(self, ttl=0, max_bytes=DEFAULT_SIZE * 1024 * 1024):
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.entries = OrderedDict()
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        # Results of the connection pool are stored from its threads
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self):
+        return self.ttl > 0
+
+    def get(self, key):
+        """Returns the `CacheEntry` for `key`, or None."""
+        with self._lock:
+            entry = self.entries.pop(key, None)
+            if entry is not None and time() - entry.created > self.ttl:
+                self.size -= entry.size
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            # Move it to the most recently used end
+            self.entries[key] = entry
+            self.hits += 1
+            return entry
+
+    def put(self, key, description, rows):
+        if not isinstance(rows, ColumnarRows):
+            rows = ColumnarRows(description, rows)
+        size = rows.nbytes()
+        if size > self.max_bytes:
+            return
+        # Names are compared without case, as Vertica does even for quoted
+        # names
+        names = set(name.lower() for name in table_names(key[0]))
+        entry = CacheEntry(description, rows, size, names, time())
+        with self._lock:
+            old = self.entries.pop(key, None)
+            if old is not None:
+                self.size -= old.size
+            self.entries[key] = entry
+            self.size += size
+            while self.size > self.max_bytes:
+                _, evicted = self.entries.popitem(last=False)
+                self.size -= evicted.size
+
+    def invalidate(self, statement):
+        """Drop the results that a mutating `Statement` may have changed."""
+        table = None
+        if statement.kind != DDL:
+            table = target_table(statement.sql)
+        if table is None:
+            self.clear()
+            return
+
+        table = table.lower()
+        with self._lock:
+            for key, entry in list(self.entries.items()):
+                if table in entry.names:
+                    del self.entries[key]
+                    self.size -= entry.size
+        _logger.debug('Result cache invalidated for table %r.', table)
+
+    def clear(self):
+        with self._lock:
+            self.entries.clear()
+            self.size = 0
+
+    def summary(self):
+        if not self.enabled:
+            return 'Result cache is off.'
+        return ('Result cache is on (%ds): %d results, %.1f of %.0f MB, '
+                '%d hits, %d misses.' % (
+                    self.ttl, len(self.entries), self.size / 1e6,
+                    self.max_bytes / 1e6, self.hits, self.misses))
+
+
+def cacheable(statement):
+    """Whether the result of a `Statement` can be served from the cache: a
+    query that doesn't create a table with SELECT ... INTO, or call a
+    volatile function.
+
+    >>> cacheable(classify('select a from t'))
+    True
+    >>> cacheable(classify("SELECT ANALYZE_STATISTICS('t')"))
+    False
+    """
+    return (statement.kind == QUERY and
+            not _VOLATILE_CALL_RE.search(statement.sql) and
+            'into' not in table_names(statement.sql))
+
+
+class CachingCursor(object):
+    """Wraps a cursor, serving read-only queries from a `ResultCache` and
+    storing the results of the ones it hasn't seen.
+
+    `context` is called for the database and search path part of the key.
+    A result is only stored once all of its rows have been read.
+    """
+
+    def __init__(self, cursor, cache, context):
+        self._cursor = cursor
+        self._cache = cache
+        self._context = context
+        self._key = None
+        self._entry = None
+        self._rows = None
+
+    def execute(self, sql, *args, **kwargs):
+        self._key = self._entry = self._rows = None
+        statement = classify(sql)
+        if statement and cacheable(statement) and not (args or kwargs):
+            key = (normalize(statement.sql),) + tuple(self._context())
+            self._entry = self._cache.get(key)
+            if self._entry is not None:
+                _logger.debug('Result cache hit. sql: %r', sql)
+                self._rows = iter(self._entry.rows)
+                return None
+            self._key = key
+
+        result = self._cursor.execute(sql, *args, **kwargs)
+        if statement and statement.mutating:
+            self._cache.invalidate(statement)
+        elif statement and statement.keyword in ('rollback', 'abort'):
+            self._cache.clear()
+        return result
+
+    def copy(self, sql, data, **kwargs):
+        self._key = self._entry = self._rows = None
+        result = self._cursor.copy(sql, data, **kwargs)
+        statement = classify(sql)
+        if statement and statement.mutating:
+            self._cache.invalidate(statement)
+        return result
+
+    @property
+    def description(self):
+        if self._entry is not None:
+            return self._entry.description
+        return self._cursor.description
+
+    @property
+    def rowcount(self):
+        if self._entry is not None:
+            return len(self._entry.rows)
+        return self._cursor.rowcount
+
+    def iterate(self):
+        if self._entry is not None:
+            return self._rows
+        if self._key is None:
+            return self._cursor.iterate()
+        return self._iterate_and_store()
+
+    def _iterate_and_store(self):
+        key, self._key = self._key, None
+        description = self._cursor.description
+        rows = ColumnarRows(description) if description else None
+        for row in self._cursor.iterate():
+            if rows is not None:
+                rows.append(row)
+                if (len(rows) % SIZE_CHECK_INTERVAL == 0 and
+                        rows.nbytes() > self._cache.max_bytes):
+                    # Too large to be cached, stop collecting
+                    rows = None
+            yield row
+        if rows is not None:
+            self._cache.put(key, description, rows)
+
+    def fetchone(self):
+        if self._entry is not None:
+            return next(self._rows, None)
+        # A result that is only partly read isn't stored
+        self._key = None
+        return self._cursor.fetchone()
+
+    def fetchall(self):
+        if self._entry is not None:
+            return list(self._rows)
+        rows = self._cursor.fetchall()
+        key, self._key = self._key, None
+        if key is not None and self._cursor.description:
+            self._cache.put(key, self._cursor.description, rows)
+        return rows
+
+    def flush_to_query_ready(self):
+        if self._entry is None:
+            self._cursor.flush_to_query_ready()
+
+    def close(self):
+        self._cursor.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
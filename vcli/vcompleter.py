@@ -2,19 +2,26 @@ from __future__ import print_function, unicode_literals
 import logging
 import re
 import itertools
+import threading
 from prompt_toolkit.completion import Completer, Completion
 from .packages.sqlcompletion import suggest_type
 from .packages.parseutils import last_word
+from .packages.prefixindex import PrefixIndex
+from .packages.fuzzymatch import fuzzy_matches
 from .packages.vspecial.namedqueries import namedqueries
 
 try:
-    from collections import Counter
+    from collections import Counter, OrderedDict
 except ImportError:
     # python 2.6
     from .packages.counter import Counter
+    from .packages.ordereddict import OrderedDict
 
 _logger = logging.getLogger(__name__)
 
+# Number of completion results kept for documents that are asked again
+COMPLETION_CACHE_SIZE = 128
+
 
 class VCompleter(Completer):
 
@@ -69,7 +76,20 @@ class VCompleter(Completer):
                            'datatypes': {}}
         self.search_path = []
 
-        self.all_completions = set(self.keywords + self.functions)
+        # The collections that are only matched at the start of their items
+        self.keyword_index = PrefixIndex(self.keywords)
+        self.function_index = PrefixIndex(self.functions)
+        self.datatype_index = PrefixIndex(self.datatypes)
+        self.all_completions = PrefixIndex(self.keywords + self.functions)
+
+        # Names of the database objects, as used for fuzzy matching
+        self.match_names = {}
+
+        # Changed with the metadata, so that the cached completions of the
+        # previous metadata are no longer used
+        self.generation = 0
+        self._completion_cache = OrderedDict()
+        self._completion_cache_lock = threading.Lock()
 
     def escape_name(self, name):
         name = name.decode('utf-8') if type(name) == bytes else name
@@ -95,10 +115,14 @@ class VCompleter(Completer):
     def extend_database_names(self, databases):
         databases = self.escaped_names(databases)
         self.databases.extend(databases)
+        self.generation += 1
+        self.add_match_names(databases)
 
     def extend_keywords(self, additional_keywords):
         self.keywords.extend(additional_keywords)
+        self.keyword_index.update(additional_keywords)
         self.all_completions.update(additional_keywords)
+        self.generation += 1
 
     def extend_schemata(self, schemata):
 
@@ -114,6 +138,8 @@ class VCompleter(Completer):
                 metadata[schema] = {}
 
         self.all_completions.update(schemata)
+        self.add_match_names(schemata)
+        self.generation += 1
 
     def extend_relations(self, data, kind):
         """ extend metadata for tables or views
@@ -124,6 +150,7 @@ class VCompleter(Completer):
         """
 
         data = [self.escaped_names(d) for d in data]
+        self.generation += 1
 
         # dbmetadata['tables']['schema_name']['table_name'] should be a list of
         # column names. Default to an asterisk
@@ -134,7 +161,7 @@ class VCompleter(Completer):
             except KeyError:
                 _logger.error('%r %r listed in unrecognized schema %r',
                               kind, relname, schema)
-            self.all_completions.add(relname)
+            self._add_name(relname)
 
     def extend_columns(self, column_data, kind):
         """ extend column metadata
@@ -145,6 +172,7 @@ class VCompleter(Completer):
         """
 
         column_data = [self.escaped_names(d) for d in column_data]
+        self.generation += 1
         metadata = self.dbmetadata[kind]
         for schema, relname, column in column_data:
             try:
@@ -152,7 +180,7 @@ class VCompleter(Completer):
             except KeyError:
                 pass
             else:
-                self.all_completions.add(column)
+                self._add_name(column)
 
     def extend_functions(self, func_data):
 
@@ -162,11 +190,12 @@ class VCompleter(Completer):
         # function metadata -- right now we're not storing any further metadata
         # so just default to None as a placeholder
         metadata = self.dbmetadata['functions']
+        self.generation += 1
 
         for f in func_data:
             schema, func = self.escaped_names(f)
             metadata[schema][func] = None
-            self.all_completions.add(func)
+            self._add_name(func)
 
     def extend_datatypes(self, type_data):
 
@@ -174,15 +203,17 @@ class VCompleter(Completer):
         # metadata, such as composite type field names. Currently, we're not
         # storing any metadata beyond typename, so just store None
         meta = self.dbmetadata['datatypes']
+        self.generation += 1
 
         if type_data:
             for t in type_data:
                 schema, type_name = self.escaped_names(t)
                 meta[schema][type_name] = None
-                self.all_completions.add(type_name)
+                self._add_name(type_name)
 
     def set_search_path(self, search_path):
         self.search_path = self.escaped_names(search_path)
+        self.generation += 1
 
     def reset_completions(self):
         self.databases = []
@@ -190,7 +221,9 @@ class VCompleter(Completer):
         self.search_path = []
         self.dbmetadata = {'tables': {}, 'views': {}, 'functions': {},
                            'datatypes': {}}
-        self.all_completions = set(self.keywords + self.functions)
+        self.all_completions = PrefixIndex(self.keywords + self.functions)
+        self.match_names = {}
+        self.generation += 1
 
     def find_matches(self, text, collection, start_only=False, fuzzy=True,
                      meta=None, meta_collection=None):
@@ -211,24 +244,9 @@ class VCompleter(Completer):
 
         text = last_word(text, include='most_punctuations').lower()
 
-        # Construct a `_match` function for either fuzzy or non-fuzzy matching
-        # The match function returns a 2-tuple used for sorting the matches,
-        # or None if the item doesn't match
-        if fuzzy:
-            regex = '.*?'.join(map(re.escape, text))
-            pat = re.compile('(%s)' % regex)
-
-            def _match(item):
-                r = pat.search(self.unescape_name(item))
-                if r:
-                    return len(r.group()), r.start()
-        else:
-            match_end_limit = len(text) if start_only else None
-
-            def _match(item):
-                match_point = item.lower().find(text, 0, match_end_limit)
-                if match_point >= 0:
-                    return match_point, 0
+        if start_only and not fuzzy and isinstance(collection, PrefixIndex):
+            # Only the items starting with the text need to be checked
+            collection = collection.startswith(text)
 
         if meta_collection:
             # Each possible completion in the collection has a corresponding
@@ -238,31 +256,93 @@ class VCompleter(Completer):
             # All completions have an identical meta
             collection = zip(collection, itertools.repeat(meta))
 
-        completions = []
-        for item, meta in collection:
-            sort_key = _match(item)
-            if sort_key:
-                if meta and len(meta) > 50:
-                    # Truncate meta-text to 50 characters, if necessary
-                    meta = meta[:47] + u'...'
+        # Each match is a 2-tuple used for sorting the matches, and the
+        # (item, meta) it matched
+        if fuzzy:
+            matches = fuzzy_matches(text, collection, self._match_name)
+        else:
+            match_end_limit = len(text) if start_only else None
+            matches = []
+            for item, meta in collection:
+                match_point = item.lower().find(text, 0, match_end_limit)
+                if match_point >= 0:
+                    matches.append(((match_point, 0), (item, meta)))
+            matches.sort()
 
-                completions.append((sort_key, item, meta))
+        completions = []
+        for sort_key, (item, meta) in matches:
+            if meta and len(meta) > 50:
+                # Truncate meta-text to 50 characters, if necessary
+                meta = meta[:47] + u'...'
+            completions.append(Completion(item, -len(text), display_meta=meta))
+        return completions
 
-        return [Completion(item, -len(text), display_meta=meta)
-                for sort_key, item, meta in sorted(completions)]
+    def _match_name(self, candidate):
+        """The unescaped, lowercased name of an (item, meta) candidate, for
+        fuzzy matching."""
+        item = candidate[0]
+        try:
+            return self.match_names[item]
+        except KeyError:
+            return self.unescape_name(item).lower()
+
+    def _add_name(self, name):
+        """Add the name of a database object to the completions."""
+        self.all_completions.add(name)
+        if name not in self.match_names:
+            self.match_names[name] = self.unescape_name(name).lower()
+
+    def add_match_names(self, names):
+        """Unescape and lowercase the names for fuzzy matching once, as they
+        are loaded, instead of on each keystroke."""
+        match_names = self.match_names
+        for name in names:
+            if name not in match_names:
+                match_names[name] = self.unescape_name(name).lower()
 
     def get_completions(self, document, complete_event, smart_completion=None):
-        word_before_cursor = document.get_word_before_cursor(WORD=True)
+        """Returns the completions for the document.
+
+        prompt_toolkit asks for the completions of the same document again
+        while the menu is open or the cursor moves, so the latest results are
+        kept, for the same metadata.
+        """
         if smart_completion is None:
             smart_completion = self.smart_completion
 
+        key = (document.text, document.cursor_position, smart_completion,
+               self.generation)
+        cache = self._completion_cache
+        with self._completion_cache_lock:
+            completions = cache.pop(key, None)
+            if completions is not None:
+                # Now the most recently used
+                cache[key] = completions
+                return list(completions)
+
+        completions, cacheable = self._get_completions(document,
+                                                       smart_completion)
+        if cacheable:
+            with self._completion_cache_lock:
+                cache[key] = completions
+                while len(cache) > COMPLETION_CACHE_SIZE:
+                    cache.popitem(last=False)
+        return list(completions)
+
+    def _get_completions(self, document, smart_completion):
+        """Returns the completions for the document, and whether they can be
+        cached."""
+        word_before_cursor = document.get_word_before_cursor(WORD=True)
+
         # If smart_completion is off then match any word that starts with
         # 'word_before_cursor'.
         if not smart_completion:
             return self.find_matches(word_before_cursor, self.all_completions,
-                                     start_only=True, fuzzy=False)
+                                     start_only=True, fuzzy=False), True
 
         completions = []
+        # Named queries are saved without changing the metadata
+        cacheable = True
         suggestions = suggest_type(document.text, document.text_before_cursor)
 
         for suggestion in suggestions:
@@ -298,7 +378,7 @@ class VCompleter(Completer):
                     # also suggest hardcoded functions using startswith
                     # matching
                     predefined_funcs = self.find_matches(word_before_cursor,
-                                                         self.functions,
+                                                         self.function_index,
                                                          start_only=True,
                                                          fuzzy=False,
                                                          meta='function')
@@ -356,7 +436,8 @@ class VCompleter(Completer):
                 completions.extend(dbs)
 
             elif suggestion['type'] == 'keyword':
-                keywords = self.find_matches(word_before_cursor, self.keywords,
+                keywords = self.find_matches(word_before_cursor,
+                                             self.keyword_index,
                                              start_only=True,
                                              fuzzy=False,
                                              meta='keyword')
@@ -388,7 +469,8 @@ class VCompleter(Completer):
                 if not suggestion['schema']:
                     # Also suggest hardcoded types
                     types = self.find_matches(word_before_cursor,
-                                              self.datatypes, start_only=True,
+                                              self.datatype_index,
+                                              start_only=True,
                                               fuzzy=False, meta='datatype')
                     completions.extend(types)
 
@@ -397,8 +479,9 @@ class VCompleter(Completer):
                                             start_only=False, fuzzy=True,
                                             meta='named query')
                 completions.extend(queries)
+                cacheable = False
 
-        return completions
+        return completions, cacheable
 
     def populate_scoped_cols(self, scoped_tbls):
         """ Find all columns in a set of scoped_tables
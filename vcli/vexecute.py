@@ -1,20 +1,65 @@
+import bz2
+import glob
+import gzip
 import logging
+import os
+import re
 import socket
+import struct
 import sys
+import threading
 
-import sqlparse
+from collections import namedtuple
+from time import time
 
-import vertica_python as vertica
+try:
+    from Queue import Queue, Empty
+except ImportError:
+    from queue import Queue, Empty
+
+try:
+    import lzma
+except ImportError:  # Python 2, unless backports.lzma is installed
+    try:
+        from backports import lzma
+    except ImportError:
+        lzma = None
 
-from sqlparse.tokens import Token as _Token
-from sqlparse.sql import Token
+import vertica_python as vertica
 
 from .packages import vspecial as special
+from .packages.columnar import ColumnarRows
+from .packages.splitter import (COPY, DDL, DML, QUERY, SESSION, SPECIAL,
+                                classify, normalize, parse_copy_from_local,
+                                split_statements, table_names, target_table)
 from .encodingutils import PY2
+from .vcache import CachingCursor, ResultCache, cacheable
+from .vjobs import BackgroundJobs
 
 
 _logger = logging.getLogger(__name__)
 
+# Request code of the CancelRequest message in the frontend/backend protocol
+CANCEL_REQUEST_CODE = 80877102
+
+# Number of connections a multi-file COPY FROM LOCAL is spread over, unless
+# parallel execution is enabled with a different number of connections
+COPY_WORKERS = 4
+
+# Size of the chunks that compressed COPY FROM LOCAL files are decompressed in
+DECOMPRESS_CHUNK_SIZE = 64 * 1024
+
+# Leading bytes of the compressed file formats that COPY FROM LOCAL
+# decompresses on the fly
+COMPRESSION_MAGIC = [
+    (b'\x1f\x8b', 'gzip'),
+    (b'BZh', 'bzip2'),
+    (b'\xfd7zXZ\x00', 'xz'),
+]
+
+CopyStats = namedtuple('CopyStats', ['file_path', 'accepted', 'rejected',
+                                     'seconds', 'size', 'error'])
+
 
 class VExecute(object):
 
@@ -60,6 +105,16 @@ class VExecute(object):
         FROM    v_catalog.databases
         ORDER BY 1'''
 
+    # Temp tables, the local ones of this session included, whose rows the
+    # other sessions can't see
+    temp_tables_query = '''
+        SELECT  table_name
+        FROM    v_catalog.tables
+        WHERE   is_temp_table'''
+
+    copy_stats_query = '''
+        SELECT GET_NUM_ACCEPTED_ROWS(), GET_NUM_REJECTED_ROWS()'''
+
     datatypes_query = '''
         SELECT schema_name, type_name
         FROM v_catalog.types, v_catalog.schemata
@@ -72,6 +127,27 @@ class VExecute(object):
         self.password = password
         self.host = host
         self.port = port
+
+        # Number of extra connections used to run read-only statements
+        # concurrently. Zero disables parallel execution.
+        self.parallel = 0
+        self._pool = []
+        self._pool_slots = None
+        # SET statements that have to be replayed on the pool connections
+        self._session_statements = []
+        # True while the main session has uncommitted changes, which the pool
+        # connections can't see
+        self._uncommitted = False
+
+        # Statements run with \bg, each on a connection of its own
+        self.jobs = BackgroundJobs(self)
+
+        # Results of read-only queries, off until it is given a ttl
+        self.cache = ResultCache()
+        self._search_path = None
+        # Names of the temp tables, looked up again after DDL
+        self._temp_tables = None
+
         self.connect()
 
     def connect(self, database=None, user=None, password=None, host=None,
@@ -83,6 +159,30 @@ class VExecute(object):
         host = (host or self.host)
         port = (port or self.port)
 
+        conn = self._open_connection(db, user, password, host, port)
+
+        if hasattr(self, 'conn'):
+            self.conn.close()
+        self.conn = conn
+        # self.conn.autocommit = True
+        self.dbname = db
+        self.user = user
+        self.password = password
+        self.host = host
+        self.port = port
+        # register_json_typecasters(self.conn, self._json_typecaster)
+        # register_hstore_typecaster(self.conn)
+
+        # The pool belongs to the previous session, and the cache may have
+        # its uncommitted changes
+        self.cache.clear()
+        self._session_statements = []
+        self._uncommitted = False
+        self._search_path = None
+        self._temp_tables = None
+        self.set_parallel(self.parallel)
+
+    def _open_connection(self, db, user, password, host, port):
         conn = vertica.connect(database=db, user=user, password=password,
                                host=host, port=int(port))
 
@@ -110,17 +210,23 @@ class VExecute(object):
             sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_KEEPINTVL, 10)
             sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_KEEPCNT, 5)
 
-        if hasattr(self, 'conn'):
-            self.conn.close()
-        self.conn = conn
-        # self.conn.autocommit = True
-        self.dbname = db
-        self.user = user
-        self.password = password
-        self.host = host
-        self.port = port
-        # register_json_typecasters(self.conn, self._json_typecaster)
-        # register_hstore_typecaster(self.conn)
+        return conn
+
+    def set_parallel(self, workers):
+        """Run read-only statements on up to `workers` extra connections.
+
+        The pool connections are opened on demand, and the ones from the
+        previous setting are closed.
+        """
+        for conn in self._pool:
+            conn.close()
+        self._pool = []
+        self.parallel = workers
+
+        # Each slot holds a pool connection, or None until it is first used
+        self._pool_slots = Queue()
+        for _ in range(workers):
+            self._pool_slots.put(None)
 
     def _json_typecaster(self, json_data):
         """Interpret incoming JSON data as a string.
@@ -136,69 +242,379 @@ class VExecute(object):
         else:
             return json_data
 
-    def run(self, statement, vspecial=None):
+    def run(self, statement, vspecial=None, parallel=True):
         """Execute the sql in the database and return the results.
 
-        :param statement: A string containing one or more sql statements
+        :param statement: A string containing one or more sql statements, or
+                          the statements already split by `split_statements`
         :param vspecial: VSpecial object
+        :param parallel: Send read-only statements to the connection pool
+                         if it is enabled
         :return: List of tuples containing (title, rows, headers, status,
                                             force_stdout)
         """
-        # Remove spaces and EOL
-        statement = statement.strip()
-        if not statement:  # Empty string
-            yield (None, None, None, None, True)
-
-        # Split the sql into separate queries and run each one.
-        for sql in sqlparse.split(statement):
-            # Remove spaces, eol and semi-colons.
-            sql = sql.rstrip(';')
-
-            if vspecial:
+        if isinstance(statement, list):
+            statements = statement
+        else:
+            # Remove spaces and EOL
+            statement = statement.strip()
+            if not statement:  # Empty string
+                yield (None, None, None, None, True)
+            statements = split_statements(statement)
+
+        if parallel and self.parallel:
+            for result in self._run_parallel(statements, vspecial):
+                yield result
+            return
+
+        for statement in statements:
+            sql = statement.sql
+
+            # Special commands start with a backslash, apart from aliases
+            # such as 'use'
+            if vspecial and (statement.kind == SPECIAL or
+                             statement.keyword in vspecial.commands):
                 # First try to run each query as special
                 try:
                     _logger.debug('Trying a vspecial command. sql: %r', sql)
-                    cur = self.conn.cursor()
-                    for result in vspecial.execute(cur, sql):
+                    cur = self.cursor()
+                    for result in vspecial.execute(cur, sql, executor=self):
                         yield result
                     return
                 except special.CommandNotFound:
                     pass
 
-            yield self.execute_normal_sql(sql)
+            yield self.execute_normal_sql(statement)
 
-    def execute_normal_sql(self, split_sql):
-        _logger.debug('Regular sql statement. sql: %r', split_sql)
-        cur = self.conn.cursor()
+    def _run_parallel(self, statements, vspecial):
+        """Like `run`, but read-only statements are sent to the connection
+        pool instead of waiting for the previous statement to finish.
 
+        Results are still yielded in the order of the statements. Any other
+        statement is a barrier: it only runs on the main connection once all
+        the statements before it have finished. So do the queries that may
+        read a temp table, since its rows are only seen by the main session.
+        """
+        pending = []
+
+        for statement in statements:
+            if (statement.kind == QUERY and not self._uncommitted and
+                    not self._may_read_temp_table(statement)):
+                pending.append(self._submit(statement))
+                continue
+
+            for job in pending:
+                yield job.result()
+            pending = []
+
+            for result in self.run([statement], vspecial=vspecial,
+                                   parallel=False):
+                yield result
+
+        for job in pending:
+            yield job.result()
+
+    def _may_read_temp_table(self, statement):
+        names = set(name.lower() for name in table_names(statement.sql))
+        return not self._temp_table_names().isdisjoint(names)
+
+    def _temp_table_names(self):
+        if self._temp_tables is None:
+            self._temp_tables = self.temp_tables()
+        return self._temp_tables
+
+    def _submit(self, statement):
+        job = _PoolJob(statement.sql)
+        if self.cache.enabled and cacheable(statement):
+            job.cache_key = self._cache_key(statement)
+            entry = self.cache.get(job.cache_key)
+            if entry is not None:
+                job.cursor = FetchedCursor(entry.description, entry.rows)
+                return job
+
+        thread = threading.Thread(target=self._run_job, args=(job,),
+                                  name='parallel_statement')
+        thread.setDaemon(True)
+        job.thread = thread
+        thread.start()
+        return job
+
+    def _run_job(self, job):
+        # Blocks until one of the pool connections is free
+        conn = self._pool_slots.get()
         try:
-            tree = sqlparse.parse(split_sql)[0]
-        except IndexError:
-            return (None, None, None, None, True)
-
-        if _is_copy_from_local(tree):
-            _execute_copy_from_local_sql(tree, cur)
-        else:
-            cur.execute(split_sql)
+            if conn is None:
+                conn = self.open_session()
+                self._pool.append(conn)
+
+            _logger.debug('Parallel sql statement. sql: %r', job.sql)
+            cur = conn.cursor()
+            cur.execute(job.sql)
+            if cur.description:
+                rows = ColumnarRows(cur.description, cur.iterate())
+                job.cursor = FetchedCursor(cur.description, rows)
+                if job.cache_key is not None:
+                    self.cache.put(job.cache_key, cur.description, rows)
+            cur.flush_to_query_ready()
+        except Exception as e:
+            job.error = e
+        finally:
+            self._pool_slots.put(conn)
+
+    def cursor(self):
+        """Returns a cursor on the main connection, which goes through the
+        result cache if it is enabled."""
+        if self.cache.enabled:
+            # Look the search path up before the statement is run, rather
+            # than in the middle of it
+            self._cache_context()
+            return CachingCursor(self.conn.cursor(), self.cache,
+                                 self._cache_context)
+        return self.conn.cursor()
+
+    def _cache_context(self):
+        if self._search_path is None:
+            self._search_path = tuple(self.search_path())
+        return (self.dbname, self._search_path)
+
+    def _cache_key(self, statement):
+        return (normalize(statement.sql),) + self._cache_context()
+
+    def open_session(self):
+        """Open another connection with the settings of the main session."""
+        conn = self._open_connection(self.dbname, self.user, self.password,
+                                     self.host, self.port)
+        for sql in self._session_statements:
+            cur = conn.cursor()
+            cur.execute(sql)
+            cur.flush_to_query_ready()
+        return conn
+
+    def _set_on_pool(self, sql):
+        self._session_statements.append(sql)
+        for conn in self._pool:
+            cur = conn.cursor()
+            cur.execute(sql)
+            cur.flush_to_query_ready()
+
+    def execute_normal_sql(self, statement):
+        """Run a single statement, either a `Statement` or a string."""
+        if not isinstance(statement, tuple):
+            statement = classify(statement)
+            if statement is None:
+                return (None, None, None, None, True)
+
+        _logger.debug('Regular sql statement. sql: %r', statement.sql)
+        cur = self.cursor()
+        copy_result = self.execute_statement(cur, statement)
+        if copy_result is not None:
+            return copy_result
 
         title = None
         statusmessage = None
-        first_token = split_sql.split()[0].lower()
-        if cur.description and first_token in ('select', 'update', 'delete', 'with',
-                                               'insert', 'explain', 'profile'):
+        if cur.description and statement.keyword in (
+                'select', 'update', 'delete', 'with', 'insert', 'explain',
+                'profile'):
             headers = [x[0] for x in cur.description]
             return (title, cur, headers, statusmessage, False)
         else:
             _logger.debug('No rows in result.')
             return (title, None, None, statusmessage, True)
 
+    def execute_statement(self, cur, statement):
+        """Run `statement` on `cur`, a cursor of the main connection, and
+        keep the state that depends on the session up to date: the SET
+        statements replayed on the pool, the search path and temp tables
+        the cache and parallel queries rely on, and uncommitted changes.
+
+        A COPY FROM LOCAL of several files reads its own results, and returns
+        the result tuple of its report. Otherwise returns None, and the
+        result of the statement is read from `cur`.
+        """
+        sql = statement.sql
+        result = None
+        if statement.copy_local:
+            head, file_paths, tail = parse_copy_from_local(sql)
+            file_paths = _expand_file_paths(file_paths)
+            copy_sql = head + 'stdin' + tail
+            if len(file_paths) > 1:
+                self.cache.invalidate(statement)
+                result = self.copy_files(cur, copy_sql, file_paths)
+            else:
+                _copy_file(cur, copy_sql, file_paths[0])
+        else:
+            cur.execute(sql)
+            if statement.kind == DDL:
+                self._temp_tables = None
+            if statement.kind == SESSION:
+                self._set_on_pool(sql)
+                if statement.search_path:
+                    self._search_path = None
+
+        self._uncommitted = _ends_uncommitted(statement, self._uncommitted)
+        return result
+
+    def cancel(self):
+        """Ask the server to cancel the statements that are running.
+
+        The cancel request is sent on a new socket, so the session itself is
+        not interrupted: the running statement fails with an error, and the
+        connection is ready for the next statement once that error has been
+        read. Pool connections are cancelled as well, and so is the background
+        job that `\fg` is waiting for.
+
+        Returns False if no cancel request could be sent.
+        """
+        sent = self.jobs.cancel_foreground()
+        for conn in [self.conn] + self._pool:
+            sent = self.send_cancel_request(conn) or sent
+        return sent
+
+    def send_cancel_request(self, conn):
+        pid = getattr(conn, 'backend_pid', None)
+        key = getattr(conn, 'backend_key', None)
+        if pid is None or key is None:
+            return False
+
+        try:
+            sock = socket.create_connection((self.host, int(self.port)), 10)
+            try:
+                sock.sendall(struct.pack('!4I', 16, CANCEL_REQUEST_CODE,
+                                         pid, key))
+            finally:
+                sock.close()
+        except socket.error as e:
+            _logger.error('Failed to send cancel request: %r', e)
+            return False
+        return True
+
+    def close_cursor(self, cur):
+        """Discard the rest of a partially read result.
+
+        The connection can't run another statement until the remaining rows
+        of the current one have been read off the socket, so the statement
+        is cancelled first for the server to stop sending them. The cursor
+        itself stays open, it is the one the next statements run on.
+        """
+        if not hasattr(cur, 'flush_to_query_ready'):
+            return
+        self.send_cancel_request(self.conn)
+        _flush_cancelled(cur)
+
+    def finish_cancelled(self):
+        """Read what is left of a cancelled statement on the main connection,
+        for it to be ready for the next statement.
+
+        Returns False if the connection is lost.
+        """
+        try:
+            _flush_cancelled(self.conn.cursor())
+        except Exception as e:
+            _logger.error('Failed to finish a cancelled statement: %r', e)
+            return False
+        return True
+
+    def copy_files(self, cursor, copy_sql, file_paths):
+        """Load several files with a COPY ... FROM stdin statement.
+
+        The files are loaded concurrently, each on one of a few extra
+        connections. If the statement has NO COMMIT the files are loaded one
+        after another on `cursor` instead, so that the loads stay in the
+        current transaction. So are those loaded into a temp table, which
+        the other sessions have their own copy of, or can't see at all.
+
+        Returns a result tuple with the rows loaded and rejected and the
+        throughput for each file.
+        """
+        start = time()
+        table = target_table(copy_sql)
+        if (re.search(r'\bno\s+commit\b', copy_sql, re.IGNORECASE) or
+                (table is not None and
+                 table.lower() in self._temp_table_names())):
+            stats = [self._load_file(cursor, copy_sql, path)
+                     for path in file_paths]
+        else:
+            stats = self._load_files_in_parallel(copy_sql, file_paths)
+        return _copy_report(stats, time() - start)
+
+    def _load_file(self, cursor, copy_sql, file_path):
+        start = time()
+        try:
+            _copy_file(cursor, copy_sql, file_path)
+            cursor.execute(self.copy_stats_query)
+            accepted, rejected = cursor.fetchone()
+            cursor.flush_to_query_ready()
+        except Exception as e:
+            _logger.error('COPY of %r failed: %r', file_path, e)
+            return CopyStats(file_path, None, None, time() - start, None, e)
+        return CopyStats(file_path, accepted, rejected, time() - start,
+                         os.path.getsize(file_path), None)
+
+    def _load_files_in_parallel(self, copy_sql, file_paths):
+        todo = Queue()
+        for index, path in enumerate(file_paths):
+            todo.put((index, path))
+        stats = [None] * len(file_paths)
+        connection_errors = []
+
+        def worker():
+            try:
+                conn = self.open_session()
+            except Exception as e:
+                connection_errors.append(e)
+                return
+            try:
+                while True:
+                    try:
+                        index, path = todo.get_nowait()
+                    except Empty:
+                        return
+                    stats[index] = self._load_file(conn.cursor(), copy_sql,
+                                                   path)
+            finally:
+                conn.close()
+
+        workers = min(self.parallel or COPY_WORKERS, len(file_paths))
+        threads = [threading.Thread(target=worker, name='copy_from_local')
+                   for _ in range(workers)]
+        for thread in threads:
+            thread.setDaemon(True)
+            thread.start()
+        for thread in threads:
+            # Join with a timeout so that Ctrl-C is still delivered
+            while thread.is_alive():
+                thread.join(0.1)
+
+        if None in stats:
+            # None of the connections could be opened
+            raise connection_errors[0]
+        return stats
+
     def search_path(self):
         """Returns the current search path as a list of schema names"""
-        with self.conn.cursor() as cur:
-            _logger.debug('Search path query. sql: %r', self.search_path_query)
-            cur.execute(self.search_path_query)
-            names = cur.fetchone()[0]
-            return names.split(b',')
+        # Not closed: a connection has a single cursor, which the caller may
+        # be using
+        cur = self.conn.cursor()
+        _logger.debug('Search path query. sql: %r', self.search_path_query)
+        cur.execute(self.search_path_query)
+        names = cur.fetchone()[0]
+        cur.flush_to_query_ready()
+        return names.split(b',')
+
+    def temp_tables(self):
+        """Returns the set of the lowercased names of the temp tables"""
+        # Not closed, like in search_path
+        cur = self.conn.cursor()
+        _logger.debug('Temp tables query. sql: %r', self.temp_tables_query)
+        cur.execute(self.temp_tables_query)
+        names = set()
+        for row in cur.fetchall():
+            name = row[0]
+            if isinstance(name, bytes):
+                name = name.decode('utf-8')
+            names.add(name.lower())
+        cur.flush_to_query_ready()
+        return names
 
     def schemata(self):
         """Returns a list of schema names in the database"""
@@ -263,46 +679,205 @@ class VExecute(object):
                 yield tuple(row)
 
 
-def _is_copy_from_local(sql_tree):
-    first_token = sql_tree.tokens[0]
-    if not (first_token.is_keyword and first_token.value.lower() == 'copy'):
-        return False
+class FetchedCursor(object):
+    """The description and rows of a result that was fetched in full on one
+    of the pool connections, or taken from the result cache. The rows are
+    usually a `ColumnarRows`."""
 
-    # Search for 'LOCAL' keyword
-    found = False
-    for i, token in enumerate(sql_tree.tokens):
-        if token.is_keyword and token.value.lower() == 'local':
-            found = True
-            break
+    def __init__(self, description, rows):
+        self.description = description
+        self.rows = rows
+        self.rowcount = len(rows)
 
-    if not found:
-        return False
+    def iterate(self):
+        return iter(self.rows)
 
-    # After 'LCOAL', there should be a whitespace then a file path
-    try:
-        token = sql_tree.tokens[i + 2]
-    except IndexError:
-        return False
 
-    return token.ttype is _Token.Literal.String.Single
+class _PoolJob(object):
+
+    def __init__(self, sql):
+        self.sql = sql
+        self.thread = None
+        self.cursor = None
+        self.error = None
+        self.cache_key = None
+
+    def result(self):
+        """Wait for the statement to finish and return its result tuple."""
+        # Join with a timeout so that Ctrl-C is still delivered. Results from
+        # the cache have no thread.
+        while self.thread is not None and self.thread.is_alive():
+            self.thread.join(0.1)
+        if self.error is not None:
+            raise self.error
+        if self.cursor is None:
+            return (None, None, None, None, True)
+        headers = [x[0] for x in self.cursor.description]
+        return (None, self.cursor, headers, None, False)
 
 
-def _execute_copy_from_local_sql(sql_tree, cursor):
-    # Search for 'LOCAL' keyword
-    for i, token in enumerate(sql_tree.tokens):
-        if token.is_keyword and token.value.lower() == 'local':
-            break
+def _ends_uncommitted(statement, uncommitted):
+    """Whether the session has uncommitted changes after running `statement`.
 
-    file_path = sql_tree.tokens[i + 2].value.strip('\'"')
+    DML opens a transaction. DDL commits implicitly in Vertica.
+    """
+    if statement.kind in (DML, COPY):
+        return True
+    if statement.kind == DDL or statement.keyword in ('commit', 'rollback',
+                                                      'end', 'abort'):
+        return False
+    return uncommitted
 
-    # Replace "LOCAL <file_path>" with "stdin"
-    sql_tree.tokens = sql_tree.tokens[0:i] + [
-        Token(_Token.Keyword, 'stdin')
-    ] + sql_tree.tokens[i + 3:]
-    new_sql = sql_tree.to_unicode()
 
+def _flush_cancelled(cur):
+    """Read the rest of a cancelled statement off `cur`."""
+    try:
+        cur.flush_to_query_ready()
+    except Exception as e:
+        # The error of the cancelled statement, the connection is ready once
+        # the messages after it are read
+        _logger.debug('Cancelled statement: %r', e)
+        cur.flush_to_query_ready()
+
+
+def _expand_file_paths(file_paths):
+    """Expand ~ and glob patterns in the file list of a COPY FROM LOCAL."""
+    expanded = []
+    for path in file_paths:
+        path = os.path.expanduser(path)
+        if any(c in path for c in '*?['):
+            matches = sorted(glob.glob(path))
+            if not matches:
+                raise IOError('No files match: %s' % path)
+            expanded.extend(matches)
+        else:
+            expanded.append(path)
+    return expanded
+
+
+def _copy_report(stats, seconds):
+    headers = ['File', 'Accepted', 'Rejected', 'Seconds', 'Rows/s', 'MB/s']
+    rows = []
+    accepted = rejected = size = 0
+    failed = []
+    for s in stats:
+        if s.error:
+            failed.append('%s: %s' % (s.file_path, s.error))
+            rows.append((s.file_path, None, None, round(s.seconds, 2), None,
+                         None))
+            continue
+        accepted += s.accepted
+        rejected += s.rejected
+        size += s.size
+        rows.append((s.file_path, s.accepted, s.rejected,
+                     round(s.seconds, 2), _per_second(s.accepted, s.seconds),
+                     round(_per_second(s.size, s.seconds) / 1e6, 2)))
+
+    status = ('Loaded %d rows from %d files in %.2fs (%d rows/s, %.2f MB/s), '
+              '%d rows rejected.' % (
+                  accepted, len(stats) - len(failed), seconds,
+                  _per_second(accepted, seconds),
+                  _per_second(size, seconds) / 1e6, rejected))
+    if failed:
+        status += '\n%d files failed:\n%s' % (len(failed), '\n'.join(failed))
+    return (None, rows, headers, status, False)
+
+
+def _per_second(amount, seconds):
+    return int(amount / seconds) if seconds > 0 else 0
+
+
+def _copy_file(cursor, copy_sql, file_path):
     cursor.flush_to_query_ready()
-    with open(file_path, 'rb') as f:
-        cursor.copy(new_sql, f)
+
+    # Leave the file alone if the statement tells the server how it's
+    # compressed, e.g. FROM LOCAL 'file.gz' GZIP
+    compression = None
+    if not re.search(r'\bstdin\s+(bzip|gzip|lzo|zstd)\b', copy_sql,
+                     re.IGNORECASE):
+        compression = _compression(file_path)
+
+    if compression:
+        with _DecompressingPipe(file_path, compression) as f:
+            cursor.copy(copy_sql, f)
+    else:
+        with open(file_path, 'rb') as f:
+            cursor.copy(copy_sql, f)
 
     cursor.flush_to_query_ready()
+
+
+def _compression(file_path):
+    """Returns the compression format of a file, or None."""
+    with open(file_path, 'rb') as f:
+        head = f.read(6)
+    for magic, compression in COMPRESSION_MAGIC:
+        if head.startswith(magic):
+            return compression
+    return None
+
+
+def _open_compressed(file_path, compression):
+    if compression == 'gzip':
+        return gzip.GzipFile(file_path, 'rb')
+    if compression == 'bzip2':
+        return bz2.BZ2File(file_path, 'rb')
+    if lzma is None:
+        raise IOError('Loading xz files needs the lzma module: %s' % file_path)
+    return lzma.LZMAFile(file_path, 'rb')
+
+
+class _DecompressingPipe(object):
+    """Context manager for reading a compressed file through a pipe.
+
+    A thread decompresses the file in chunks and writes them to the pipe, so
+    memory use is bounded by the pipe buffer and nothing is written to disk.
+    `cursor.copy` gets the read end of the pipe, which is a real file object.
+    """
+
+    def __init__(self, file_path, compression):
+        self.file_path = file_path
+        self.compression = compression
+        self.reader = None
+        self.thread = None
+        self.error = None
+
+    def __enter__(self):
+        source = _open_compressed(self.file_path, self.compression)
+        read_fd, write_fd = os.pipe()
+        self.reader = os.fdopen(read_fd, 'rb')
+        self.thread = threading.Thread(
+            target=self._feed, args=(source, os.fdopen(write_fd, 'wb')),
+            name='decompress')
+        self.thread.setDaemon(True)
+        self.thread.start()
+        return self.reader
+
+    def _feed(self, source, writer):
+        try:
+            while True:
+                chunk = source.read(DECOMPRESS_CHUNK_SIZE)
+                if not chunk:
+                    break
+                writer.write(chunk)
+        except Exception as e:
+            self.error = e
+        finally:
+            source.close()
+            try:
+                writer.close()
+            except (IOError, OSError):
+                # The read end was closed because the COPY failed
+                pass
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        # Closing the read end also stops the thread if the COPY failed
+        # before reading the whole file
+        self.reader.close()
+        while self.thread.is_alive():
+            self.thread.join(0.1)
+        if exc_type is None and self.error is not None:
+            # The server has already seen the end of the data
+            raise IOError('Failed to decompress %s, rows before the error '
+                          'may have been loaded: %s' % (self.file_path,
+                                                        self.error))
@@ -0,0 +1,218 @@
+"""Background jobs for `\\bg`, `\\jobs`, `\\fg` and `\\kill`.
+
+Each job runs one statement on a connection of its own, from a worker
+thread. Its rows are written to a csv file as they are fetched, so a job
+holds no result in memory and the prompt stays usable while it runs. The
+file is deleted once the result has been read with `\\fg`, and the files of
+the jobs that were never brought back are deleted when vcli exits.
+"""
+import atexit
+import csv
+import logging
+import os
+import tempfile
+import threading
+from io import open
+from time import time
+
+from .batch import row_writer
+from .encodingutils import PY2
+from .packages.splitter import classify
+
+_logger = logging.getLogger(__name__)
+
+RUNNING = 'running'
+DONE = 'done'
+FAILED = 'failed'
+CANCELLED = 'cancelled'
+
+# The spill files that are left, deleted at exit. Only the paths are kept,
+# not the jobs, which would keep their session open until then.
+_spill_paths = set()
+
+
+def _remove_file(path):
+    _spill_paths.discard(path)
+    try:
+        os.remove(path)
+    except OSError as e:
+        _logger.error('Failed to delete %s: %r', path, e)
+
+
+@atexit.register
+def _remove_spill_files():
+    for path in list(_spill_paths):
+        _remove_file(path)
+
+
+class Job(object):
+
+    def __init__(self, job_id, sql):
+        self.id = job_id
+        self.sql = sql
+        self.status = RUNNING
+        self.start = time()
+        self.end = None
+        self.rowcount = 0
+        self.headers = None
+        self.spill_path = None
+        self.error = None
+        self.conn = None
+        self.thread = None
+        self.cancelled = False
+        self.notified = False
+
+    def elapsed(self):
+        return (self.end or time()) - self.start
+
+    def wait(self):
+        # Join with a timeout so that Ctrl-C is still delivered
+        while self.thread.is_alive():
+            self.thread.join(0.1)
+
+    def iterate(self):
+        """Yield the rows of the result, read back from the spill file.
+
+        The result can only be read once: the file is deleted when all the
+        rows have been read, or the rest of them are discarded.
+        """
+        try:
+            if PY2:
+                f = open(self.spill_path, 'rb')
+            else:
+                f = open(self.spill_path, 'r', encoding='utf-8', newline='')
+            with f:
+                reader = csv.reader(f)
+                next(reader)  # The header
+                for row in reader:
+                    yield row
+        finally:
+            self.remove_spill()
+
+    def remove_spill(self):
+        """Delete the spill file, if there is one."""
+        path, self.spill_path = self.spill_path, None
+        if path is not None:
+            _remove_file(path)
+
+
+class BackgroundJobs(object):
+    """The background jobs of a `VExecute` session."""
+
+    def __init__(self, vexecute):
+        self.vexecute = vexecute
+        self.jobs = []
+        self.last_id = 0
+        # The job that `\fg` is waiting for, Ctrl-C cancels it
+        self.foreground = None
+        # The jobs that have a spill file, until `close`
+        self._spilled = []
+
+    def start(self, sql):
+        self.last_id += 1
+        job = Job(self.last_id, sql)
+        job.thread = threading.Thread(target=self._run, args=(job,),
+                                      name='background_job')
+        job.thread.setDaemon(True)
+        self.jobs.append(job)
+        job.thread.start()
+        return job
+
+    def _run(self, job):
+        try:
+            job.conn = self.vexecute.open_session()
+            cur = job.conn.cursor()
+            _logger.debug('Background job %d. sql: %r', job.id, job.sql)
+            cur.execute(job.sql)
+            if cur.description:
+                job.headers = [x[0] for x in cur.description]
+                self._spill(job, cur)
+            cur.flush_to_query_ready()
+            job.status = DONE
+            statement = classify(job.sql)
+            if statement is not None and statement.mutating:
+                self.vexecute.cache.invalidate(statement)
+        except Exception as e:
+            _logger.error('Background job %d failed: %r', job.id, e)
+            job.error = e
+            job.status = CANCELLED if job.cancelled else FAILED
+            # A failed job has no result to read back
+            job.remove_spill()
+        finally:
+            job.end = time()
+            if job.conn is not None:
+                job.conn.close()
+                job.conn = None
+
+    def _spill(self, job, cur):
+        fd, job.spill_path = tempfile.mkstemp(prefix='vcli-job%d-' % job.id,
+                                              suffix='.csv')
+        _spill_paths.add(job.spill_path)
+        self._spilled.append(job)
+        if PY2:
+            f = os.fdopen(fd, 'wb')
+        else:
+            f = open(fd, 'w', encoding='utf-8', newline='')
+        with f:
+            write_row = row_writer('csv', f)
+            write_row(job.headers)
+            for row in cur.iterate():
+                write_row(row)
+                job.rowcount += 1
+
+    def get(self, job_id=None):
+        """Returns the job with the given id, or the latest job."""
+        if job_id is None:
+            return self.jobs[-1] if self.jobs else None
+        for job in self.jobs:
+            if job.id == job_id:
+                return job
+        return None
+
+    def attach(self, job):
+        """Wait for a job to finish and remove it from the job table."""
+        self.foreground = job
+        try:
+            job.wait()
+        finally:
+            self.foreground = None
+        job.notified = True
+        self.jobs.remove(job)
+
+    def kill(self, job):
+        """Ask the server to cancel the statement of a running job."""
+        conn = job.conn
+        if job.status != RUNNING or conn is None:
+            return False
+        job.cancelled = True
+        return self.vexecute.send_cancel_request(conn)
+
+    def cancel_foreground(self):
+        """Cancel the job that `\\fg` is waiting for, if any."""
+        job = self.foreground
+        return job is not None and self.kill(job)
+
+    def close(self):
+        """Delete the spill files that are left. Those of a session that isn't
+        closed are deleted at exit."""
+        for job in self._spilled:
+            job.remove_spill()
+        self._spilled = []
+
+    def finished(self):
+        """Returns the jobs that finished since the last call."""
+        finished = [job for job in self.jobs
+                    if job.status != RUNNING and not job.notified]
+        for job in finished:
+            job.notified = True
+        return finished
+
+
+def job_summary(job):
+    """One line about a job, e.g. for the notice when it finishes."""
+    line = '[%d] %s in %.1fs' % (job.id, job.status, job.elapsed())
+    if job.status == DONE and job.spill_path:
+        line += ', %d rows in %s' % (job.rowcount, job.spill_path)
+    elif job.error is not None:
+        line += ': %s' % job.error
+    return line
@@ -0,0 +1,133 @@
+"""The last few results of the session, for `\\last`.
+
+The rows of each result are copied to a temporary spill file while they are
+being printed, so they can be shown again in another output mode, or written
+to a file with `\\o`, without running the query again. The spill file is
+memory-mapped to read the rows back, so only the row being formatted is held
+in memory.
+"""
+import logging
+import mmap
+import tempfile
+
+from array import array
+from collections import deque
+
+try:
+    import cPickle as pickle
+except ImportError:
+    import pickle
+
+_logger = logging.getLogger(__name__)
+
+# Defaults of the last_results and last_results_size settings, the size is
+# in megabytes
+DEFAULT_KEEP = 5
+DEFAULT_SIZE = 64
+
+# Protocol 2 is the most compact one that Python 2 can read
+PICKLE_PROTOCOL = 2
+
+
+class SpilledResult(object):
+    """A result whose rows are kept in a spill file.
+
+    It has the `description`, `iterate()` and `rowcount` of a cursor, so
+    `format_output` can print it.
+    """
+
+    def __init__(self, title, headers, status, description=None):
+        self.title = title
+        self.headers = headers
+        self.status = status
+        self.description = description
+        # Deleted by the OS as soon as it is closed
+        self.file = tempfile.TemporaryFile(prefix='vcli-last-')
+        # Row i is stored between offsets[i] and offsets[i + 1]
+        self.offsets = array('L', [0])
+        self.size = 0
+        # False if the rows were not all read, or did not all fit
+        self.complete = False
+
+    @property
+    def rowcount(self):
+        return len(self.offsets) - 1
+
+    def append(self, row):
+        data = pickle.dumps(tuple(row), PICKLE_PROTOCOL)
+        self.file.write(data)
+        self.size += len(data)
+        self.offsets.append(self.size)
+
+    def iterate(self):
+        if not self.size:
+            return iter(())
+        self.file.flush()
+        return self._iterate()
+
+    def _iterate(self):
+        data = mmap.mmap(self.file.fileno(), self.size,
+                         access=mmap.ACCESS_READ)
+        try:
+            offsets = self.offsets
+            for i in range(len(offsets) - 1):
+                yield pickle.loads(data[offsets[i]:offsets[i + 1]])
+        finally:
+            data.close()
+
+    def close(self):
+        self.file.close()
+
+
+class LastResults(object):
+    """Keeps the `keep` latest results, in about `max_bytes` of spill files.
+
+    Older results are dropped to make room for a new one. When a single
+    result doesn't fit, only its first rows are kept.
+    """
+
+    def __init__(self, keep=DEFAULT_KEEP, max_bytes=DEFAULT_SIZE * 1024 * 1024):
+        self.keep = keep
+        self.max_bytes = max_bytes
+        # The latest result first
+        self.results = deque()
+
+    def capture(self, title, cur, headers, status):
+        """Returns the rows of `cur`, which are also copied to a new spill
+        file as they are read."""
+        if not self.keep:
+            return cur
+        result = SpilledResult(title, headers, status,
+                               getattr(cur, 'description', None))
+        self.results.appendleft(result)
+        while len(self.results) > self.keep:
+            self.results.pop().close()
+        return self._capture(result, cur)
+
+    def _capture(self, result, cur):
+        rows = cur.iterate() if hasattr(cur, 'iterate') else cur
+        budget = self._budget(result)
+        full = False
+        for row in rows:
+            if not full:
+                result.append(row)
+                while result.size > budget and self.results[-1] is not result:
+                    self.results.pop().close()
+                    budget = self._budget(result)
+                full = result.size > budget
+            yield row
+        result.complete = not full
+
+    def _budget(self, result):
+        return self.max_bytes - sum(r.size for r in self.results
+                                    if r is not result)
+
+    def get(self, n=1):
+        """Returns the `n`th latest result, or None."""
+        if 0 < n <= len(self.results):
+            return self.results[n - 1]
+        return None
+
+    def clear(self):
+        while self.results:
+            self.results.pop().close()
@@ -0,0 +1,162 @@
+import errno
+import os
+import subprocess
+import sys
+
+import click
+
+try:
+    from shutil import get_terminal_size
+except ImportError:  # Python 2
+    from click import get_terminal_size
+
+
+class PagerQuit(Exception):
+    """Raised from the `write` method of a pager when the user quits it."""
+
+
+class BuiltinPager(object):
+    """A minimal pager that writes through to the terminal a screen at a time.
+
+    Unlike piping the output to `less`, `write` blocks while the user is
+    looking at a full screen. Since the query output is formatted lazily,
+    rows are only fetched from the server as the user scrolls.
+
+    Keys: space shows the next screen, enter shows the next line and q (or
+    Ctrl-C) quits, in which case `write` raises `PagerQuit`.
+    """
+
+    prompt = u'--More--'
+
+    def __init__(self, output=None):
+        self.output = output or sys.stdout
+        self.lines_left = 0
+        self.reset()
+
+    def reset(self):
+        """Start a new page, e.g. for the next result."""
+        self.lines_left = self._page_height()
+
+    def write(self, text):
+        if not self.output.isatty():
+            click.echo(text, file=self.output, nl=False)
+            return
+
+        width = self._page_width()
+        for line in text.splitlines(True):
+            if self.lines_left <= 0:
+                self._wait_for_key()
+            click.echo(line, file=self.output, nl=False)
+            # Long lines are wrapped by the terminal
+            self.lines_left -= 1 + max(len(line.rstrip('\n')) - 1, 0) // width
+
+    def flush(self):
+        self.output.flush()
+
+    def close(self):
+        self.output.flush()
+
+    def _wait_for_key(self):
+        self.output.flush()
+        click.echo(click.style(self.prompt, reverse=True), file=self.output,
+                   nl=False)
+        try:
+            key = click.getchar()
+        except KeyboardInterrupt:
+            key = 'q'
+        finally:
+            # Erase the prompt
+            click.echo(u'\r%s\r' % (u' ' * len(self.prompt)),
+                       file=self.output, nl=False)
+
+        if key in ('q', 'Q'):
+            raise PagerQuit
+        elif key in ('\r', '\n', 'j'):
+            self.lines_left = 1
+        else:
+            self.lines_left = self._page_height()
+
+    def _page_height(self):
+        # Leave one line for the prompt
+        return max(get_terminal_size()[1] - 1, 1)
+
+    def _page_width(self):
+        return max(get_terminal_size()[0], 1)
+
+
+class PipePager(object):
+    """Streams the output into an external pager, `less` unless $PAGER is
+    set, through its standard input.
+
+    The pager is started with the first write and shows the first screen as
+    soon as it has been written, while the rest of the result is still being
+    formatted. Only the text being written is held in memory. Once the user
+    quits the pager, `write` raises `PagerQuit` for the rest of the output.
+
+    When the output isn't a terminal, or the pager can't be started, the
+    text is written to the output directly.
+    """
+
+    def __init__(self, output=None, command=None):
+        self.output = output or sys.stdout
+        self.command = command or os.environ.get('PAGER') or 'less'
+        self.process = None
+        # Write to the output, because the pager couldn't be used
+        self.direct = False
+        self.quit = False
+        self.encoding = getattr(self.output, 'encoding', None) or 'utf-8'
+
+    def reset(self):
+        """Called for the next result, the pager keeps running."""
+
+    def write(self, text):
+        if self.quit:
+            raise PagerQuit
+        if self.process is None and (self.direct or not self._start()):
+            self.direct = True
+            click.echo(text, file=self.output, nl=False)
+            return
+
+        if not isinstance(text, bytes):
+            text = text.encode(self.encoding, 'replace')
+        try:
+            self.process.stdin.write(text)
+            # Let the pager show the first screen before the next batch
+            self.process.stdin.flush()
+        except IOError as e:
+            if e.errno not in (errno.EPIPE, errno.EINVAL):
+                raise
+            self.quit = True
+            raise PagerQuit
+
+    def flush(self):
+        if self.process is None:
+            self.output.flush()
+
+    def close(self):
+        """Wait for the user to quit the pager."""
+        if self.process is None:
+            self.output.flush()
+            return
+        try:
+            self.process.stdin.close()
+        except IOError:
+            pass
+        while True:
+            try:
+                self.process.wait()
+            except KeyboardInterrupt:
+                # The pager handles Ctrl-C itself
+                continue
+            break
+        self.process = None
+
+    def _start(self):
+        if not self.output.isatty():
+            return False
+        try:
+            self.process = subprocess.Popen(self.command, shell=True,
+                                            stdin=subprocess.PIPE)
+        except OSError:
+            return False
+        return True